@@ -1,6 +1,9 @@
 # api/Oauth2.py
 
+import hashlib
 import os
+import time
+from collections import OrderedDict
 from dotenv import load_dotenv
 from fastapi import HTTPException, Header, status
 from jose import JWTError, jwt
@@ -12,6 +15,28 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+# "jose" (python-jose) or "pyjwt", which decodes HS256 tokens noticeably faster
+JWT_BACKEND = os.getenv("JWT_BACKEND", "jose")
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
+
+
+def load_jwt_backend(name: str):
+    """
+    Return the (decode, error class) pair for the named JWT library.
+    Tokens are always issued with python-jose; both backends read them.
+    """
+    if name == "jose":
+        return jwt.decode, JWTError
+    if name == "pyjwt":
+        import jwt as pyjwt
+        return pyjwt.decode, pyjwt.PyJWTError
+    raise ValueError(f"Unknown JWT_BACKEND: {name}")
+
+
+jwt_decode, JWTDecodeError = load_jwt_backend(JWT_BACKEND)
+
+# sha256(token) -> (exp timestamp, TokenData), least recently used first
+_verified_tokens: "OrderedDict[bytes, tuple]" = OrderedDict()
 
 
 def create_access_token(data: dict) -> str:
@@ -28,23 +53,39 @@ def create_access_token(data: dict) -> str:
 def verify_access_token(token: str) -> TokenData:
     """
     Decode the JWT. Raise a 401 HTTPException on any failure.
+    Tokens verified before are answered from a bounded cache until they expire.
     """
+    key = hashlib.sha256(token.encode()).digest()
+    cached = _verified_tokens.get(key)
+    if cached is not None:
+        exp, token_data = cached
+        if exp > time.time():
+            _verified_tokens.move_to_end(key)
+            return token_data
+        del _verified_tokens[key]
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        print(payload)
-    except JWTError:
+        payload = jwt_decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTDecodeError:
         raise credentials_exception
 
     # Try both "id" or "_id" if that's what you encoded
     user_id = payload.get("id") 
     if not user_id:
         raise credentials_exception
-    return TokenData(id=str(user_id))
+    token_data = TokenData(id=str(user_id))
+
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)) and TOKEN_CACHE_SIZE > 0:
+        _verified_tokens[key] = (exp, token_data)
+        if len(_verified_tokens) > TOKEN_CACHE_SIZE:
+            _verified_tokens.popitem(last=False)
+    return token_data
 
 
 async def get_current_user(
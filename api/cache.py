@@ -0,0 +1,173 @@
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", 64 * 1024 * 1024))
+CACHE_TTL = float(os.getenv("CACHE_TTL", 60))
+
+_MISSING = object()
+
+
+def estimate_size(value: Any) -> int:
+    """
+    Approximate the memory cost of a cached value by its JSON length.
+    """
+    return len(json.dumps(value, default=str))
+
+
+class MemoryCache:
+    """
+    In-process LRU cache with a per-entry TTL and a cap on the total
+    estimated size of the stored values, in bytes.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._data: "OrderedDict[str, Tuple[float, int, Any]]" = OrderedDict()
+
+    async def get(self, key: str) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return _MISSING
+        expires_at, size, value = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return _MISSING
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    async def set(self, key: str, value: Any):
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = (time.monotonic() + self.ttl, size, value)
+        self.size += size
+        while self.size > self.max_bytes:
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+            self.evictions += 1
+
+    async def delete(self, key: str):
+        if key in self._data:
+            self._remove(key)
+
+    async def delete_prefix(self, prefix: str):
+        for key in [k for k in self._data if k.startswith(prefix)]:
+            self._remove(key)
+
+    async def stats(self) -> dict:
+        return {
+            "backend": "memory",
+            "entries": len(self._data),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def _remove(self, key: str):
+        _, size, _ = self._data.pop(key)
+        self.size -= size
+
+
+class NullCache:
+    """
+    Backend that stores nothing, for turning caching off with CACHE_BACKEND=none.
+    """
+
+    async def get(self, key: str) -> Any:
+        return _MISSING
+
+    async def set(self, key: str, value: Any):
+        pass
+
+    async def delete(self, key: str):
+        pass
+
+    async def delete_prefix(self, prefix: str):
+        pass
+
+    async def stats(self) -> dict:
+        return {"backend": "none"}
+
+
+class ReadThroughCache:
+    """
+    Read-through wrapper around a cache backend.
+
+    Concurrent misses for the same key share a single call to the loader.
+    A load that overlaps an invalidation is returned to its callers but not
+    stored, so a write can never be undone by a slower read.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.coalesced = 0
+        self._inflight: dict = {}
+        self._generation = 0
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        value = await self.backend.get(key)
+        if value is not _MISSING:
+            return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(self._load(key, loader))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield so one cancelled request does not cancel the load for the others
+        return await asyncio.shield(task)
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        generation = self._generation
+        value = await loader()
+        if value is not None and generation == self._generation:
+            await self.backend.set(key, value)
+        return value
+
+    async def invalidate(self, *keys: str, prefix: str = None):
+        self._generation += 1
+        for key in keys:
+            await self.backend.delete(key)
+        if prefix is not None:
+            await self.backend.delete_prefix(prefix)
+
+    async def stats(self) -> dict:
+        stats = await self.backend.stats()
+        stats["coalesced"] = self.coalesced
+        return stats
+
+
+def make_backend(name: str = CACHE_BACKEND):
+    if name == "memory":
+        return MemoryCache(CACHE_MAX_BYTES, CACHE_TTL)
+    if name == "none":
+        return NullCache()
+    raise ValueError(f"Unknown CACHE_BACKEND: {name}")
+
+
+blog_cache = ReadThroughCache(make_backend())
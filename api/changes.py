@@ -0,0 +1,269 @@
+"""
+Cross-worker invalidation. Every worker runs a ChangeListener from the app
+lifespan; it turns writes made by any worker (or by hand) into ChangeEvents
+for the in-process subscribers, such as the post cache and the in-memory
+search index.
+
+Change streams need a replica set. For local testing a single node is
+enough:
+
+    mongod --replSet rs0 --dbpath /tmp/rs0
+    mongosh --eval 'rs.initiate()'
+    MONGO_URI="mongodb://localhost:27017/?replicaSet=rs0" uvicorn api.main:app --workers 2
+
+On a standalone mongod the listener falls back to polling `updated_at`.
+"""
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Set
+from dotenv import load_dotenv
+from pymongo.errors import OperationFailure, PyMongoError
+from .schemas import db
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# auto: change streams, polling on a standalone mongod; stream; poll; off
+CHANGE_LISTENER = os.getenv("CHANGE_LISTENER", "auto")
+# key of the persisted resume token, shared by the workers of one deployment
+CHANGE_STREAM_NAME = os.getenv("CHANGE_STREAM_NAME", "blog-api")
+CHANGE_TOKEN_SAVE_INTERVAL = float(os.getenv("CHANGE_TOKEN_SAVE_INTERVAL", 5))
+CHANGE_POLL_INTERVAL = float(os.getenv("CHANGE_POLL_INTERVAL", 2))
+CHANGE_RECONNECT_BACKOFF = float(os.getenv("CHANGE_RECONNECT_BACKOFF", 1))
+
+WATCHED_COLLECTIONS = ("blogPost", "users")
+
+# server error codes
+NOT_A_REPLICA_SET = 40573
+RESUME_TOKEN_ERRORS = (260, 280, 286)  # InvalidResumeToken, ChangeStreamFatalError, ChangeStreamHistoryLost
+
+# event operations; "reset" means events may have been missed and
+# subscribers should drop everything they hold for the collection
+INSERT = "insert"
+UPDATE = "update"
+DELETE = "delete"
+RESET = "reset"
+
+
+class ChangeEvent:
+    __slots__ = ("collection", "operation", "id", "document")
+
+    def __init__(self, collection: str, operation: str, id=None, document: Optional[dict] = None):
+        self.collection = collection
+        self.operation = operation
+        self.id = id
+        self.document = document
+
+
+Subscriber = Callable[[ChangeEvent], Awaitable[None]]
+
+
+class EventBus:
+    """
+    In-process publish/subscribe by collection. A failing subscriber is
+    logged and does not stop the others.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, List[Subscriber]] = defaultdict(list)
+
+    def subscribe(self, collection: str, subscriber: Subscriber):
+        self._subscribers[collection].append(subscriber)
+
+    async def publish(self, event: ChangeEvent):
+        for subscriber in self._subscribers.get(event.collection, ()):
+            try:
+                await subscriber(event)
+            except Exception:
+                logger.exception("Change subscriber %r failed on %s %s",
+                                 subscriber, event.collection, event.operation)
+
+
+class ChangeListener:
+    """
+    Watch `collections` and publish what changes to `bus`.
+
+    With change streams the resume token is kept in memory for reconnects
+    and saved to the `changeStreams` collection every few seconds, so a
+    restarted worker carries on where the deployment left off. If the token
+    is no longer usable the stream restarts from now and a reset is
+    published. Without a replica set, `updated_at` is polled instead.
+    """
+
+    def __init__(self, bus: EventBus, collections: Sequence[str], mode: str = CHANGE_LISTENER,
+                 name: str = CHANGE_STREAM_NAME):
+        if mode not in ("auto", "stream", "poll", "off"):
+            raise ValueError(f"Unknown CHANGE_LISTENER: {mode}")
+        self.bus = bus
+        self.collections = tuple(collections)
+        self.mode = mode
+        self.name = name
+        self.active_mode: Optional[str] = None
+        self.token = None
+        self._token_saved_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self.mode == "off" or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        if self.active_mode == "stream":
+            await self._save_token(force=True)
+
+    async def _run(self):
+        try:
+            if self.mode != "poll":
+                try:
+                    await self._stream()
+                    return
+                except OperationFailure as e:
+                    if e.code != NOT_A_REPLICA_SET or self.mode == "stream":
+                        raise
+                    logger.info("MongoDB is not a replica set, polling for changes every %ss", CHANGE_POLL_INTERVAL)
+            await self._poll()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Change listener stopped; in-process caches will only see local writes")
+
+    async def _publish_resets(self):
+        for collection in self.collections:
+            await self.bus.publish(ChangeEvent(collection, RESET))
+
+    # change streams
+
+    async def _stream(self):
+        self.active_mode = "stream"
+        state = await db["changeStreams"].find_one({"_id": self.name})
+        self.token = state and state.get("token")
+        backoff = CHANGE_RECONNECT_BACKOFF
+        pipeline = [{"$match": {"ns.coll": {"$in": list(self.collections)}}}]
+        while True:
+            try:
+                async with db.watch(pipeline, full_document="updateLookup", start_after=self.token) as stream:
+                    logger.info("Watching %s for changes", ", ".join(self.collections))
+                    backoff = CHANGE_RECONNECT_BACKOFF
+                    async for change in stream:
+                        await self._dispatch(change)
+                        self.token = stream.resume_token
+                        await self._save_token()
+            except OperationFailure as e:
+                if e.code == NOT_A_REPLICA_SET:
+                    raise
+                if e.code not in RESUME_TOKEN_ERRORS:
+                    logger.warning("Change stream failed, reconnecting in %ss: %s", backoff, e)
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, 60)
+                    continue
+                # the oplog no longer covers the token: start from now and
+                # tell subscribers they may have missed changes
+                logger.warning("Change stream resume token is no longer valid, restarting: %s", e)
+                self.token = None
+                await db["changeStreams"].delete_one({"_id": self.name})
+                await self._publish_resets()
+            except PyMongoError as e:
+                # the driver already retried once; the token picks up where we stopped
+                logger.warning("Change stream lost, reconnecting in %ss: %s", backoff, e)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+
+    async def _dispatch(self, change: dict):
+        operation = change["operationType"]
+        collection = change.get("ns", {}).get("coll")
+        if operation in ("insert", "update", "replace", "delete"):
+            await self.bus.publish(ChangeEvent(
+                collection,
+                DELETE if operation == "delete" else INSERT if operation == "insert" else UPDATE,
+                change["documentKey"]["_id"],
+                change.get("fullDocument"),
+            ))
+        elif operation in ("drop", "rename", "dropDatabase", "invalidate"):
+            if collection in self.collections:
+                await self.bus.publish(ChangeEvent(collection, RESET))
+            else:
+                await self._publish_resets()
+
+    async def _save_token(self, force: bool = False):
+        now = asyncio.get_running_loop().time()
+        if self.token is None or (not force and now - self._token_saved_at < CHANGE_TOKEN_SAVE_INTERVAL):
+            return
+        self._token_saved_at = now
+        try:
+            await db["changeStreams"].replace_one(
+                {"_id": self.name},
+                {"token": self.token, "saved_at": datetime.now(timezone.utc)},
+                upsert=True,
+            )
+        except PyMongoError as e:
+            logger.warning("Could not save change stream resume token: %s", e)
+
+    # polling fallback
+
+    async def _poll(self):
+        """
+        Publish documents whose `updated_at` moved since the last poll.
+        Deletes leave nothing to find, so each collection's count is checked
+        too; when it shrinks more than new inserts explain, the ids are
+        listed and a delete is published for each one that is gone. Polls
+        overlap by one interval to tolerate clock skew between workers;
+        documents already seen are skipped.
+        """
+        self.active_mode = "poll"
+        overlap = timedelta(seconds=CHANGE_POLL_INTERVAL)
+        watermarks = {c: datetime.now(timezone.utc) for c in self.collections}
+        ids = {c: await self._ids(c) for c in self.collections}
+        counts = {c: len(ids[c]) for c in self.collections}
+        seen: Dict[str, Dict] = {c: {} for c in self.collections}
+        while True:
+            await asyncio.sleep(CHANGE_POLL_INTERVAL)
+            for collection in self.collections:
+                try:
+                    await self._poll_collection(collection, watermarks, counts, ids, seen, overlap)
+                except PyMongoError as e:
+                    logger.warning("Polling %s for changes failed: %s", collection, e)
+
+    async def _ids(self, collection: str) -> Set:
+        return {doc["_id"] async for doc in db[collection].find({}, {"_id": 1})}
+
+    async def _poll_collection(self, collection, watermarks, counts, ids, seen, overlap):
+        since = (watermarks[collection] - overlap).isoformat()
+        docs = await db[collection].find({"updated_at": {"$gte": since}}).sort("updated_at", 1).to_list(None)
+        fresh = [doc for doc in docs if seen[collection].get(doc["_id"]) != doc["updated_at"]]
+        seen[collection] = {doc["_id"]: doc["updated_at"] for doc in docs}
+        inserted = 0
+        for doc in fresh:
+            created = doc.get("created_at") == doc["updated_at"]
+            inserted += created
+            ids[collection].add(doc["_id"])
+            await self.bus.publish(ChangeEvent(collection, INSERT if created else UPDATE, doc["_id"], doc))
+        if docs:
+            latest = datetime.fromisoformat(docs[-1]["updated_at"])
+            watermarks[collection] = max(watermarks[collection], latest)
+        count = await db[collection].count_documents({})
+        previous, counts[collection] = counts[collection], count
+        if count >= previous + inserted:
+            return
+        # something was deleted: list the ids, never whole documents
+        current = await self._ids(collection)
+        gone = ids[collection] - current
+        ids[collection] = current
+        for id in gone:
+            await self.bus.publish(ChangeEvent(collection, DELETE, id))
+        if not gone:
+            # ids written without updated_at went unnoticed; resync the subscribers
+            await self.bus.publish(ChangeEvent(collection, RESET))
+
+
+change_bus = EventBus()
+change_listener = ChangeListener(change_bus, WATCHED_COLLECTIONS)
@@ -0,0 +1,240 @@
+import asyncio
+import json
+import math
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+from dotenv import load_dotenv
+from .metrics import concurrency_in_flight, concurrency_limit, concurrency_rejected
+
+load_dotenv()
+
+CONCURRENCY_LIMIT_ENABLED = os.getenv("CONCURRENCY_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+CONCURRENCY_QUEUE_TIMEOUT_MS = float(os.getenv("CONCURRENCY_QUEUE_TIMEOUT_MS", 1000))
+# bcrypt and SMTP routes; every other GET is "read" and everything else "write"
+CONCURRENCY_EXPENSIVE_PATHS = tuple(p for p in os.getenv(
+    "CONCURRENCY_EXPENSIVE_PATHS", "/login,/registration,/otp,/password").split(",") if p)
+# never limited: probes, instrumentation, and streams whose duration is not a latency signal
+CONCURRENCY_EXEMPT_PATHS = tuple(p for p in os.getenv(
+    "CONCURRENCY_EXEMPT_PATHS", "/healthz,/readyz,/metrics,/concurrency,/blog/export,/blog/import").split(",") if p)
+
+# route class -> (initial limit, min, max, queue size, target latency in ms)
+_DEFAULTS = {
+    "read": (64, 4, 512, 128, 250),
+    "write": (32, 2, 256, 64, 500),
+    "expensive": (8, 1, 64, 16, 2000),
+}
+
+
+class Overloaded(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit for one route class.
+
+    Each finished request reports its latency. A request slower than
+    `target` or failing with a 5xx cuts the limit by `backoff` (at most once
+    per target interval, so one slow burst is one cut); while the limit is
+    actually in use, fast successes raise it by one. Requests over the limit
+    wait in a FIFO queue of `queue_size` for up to `queue_timeout` seconds;
+    beyond that they are rejected at once, which keeps the latency of the
+    admitted ones close to the target.
+    """
+
+    backoff = 0.9
+
+    def __init__(self, name: str, initial: int, min_limit: int, max_limit: int, queue_size: int,
+                 target: float, queue_timeout: float):
+        self.name = name
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.queue_size = queue_size
+        self.target = target
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.latency = 0.0  # EWMA of admitted requests, seconds
+        self.accepted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._last_decrease = 0.0
+        concurrency_limit.set(name, value=int(self.limit))
+
+    def _retry_after(self) -> int:
+        # roughly how long the current queue takes to clear
+        per_slot = self.latency or self.target
+        return max(1, math.ceil(per_slot * (len(self._waiters) + 1) / max(1, int(self.limit))))
+
+    async def acquire(self):
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self._admit()
+            return
+        if len(self._waiters) >= self.queue_size:
+            self.rejected += 1
+            concurrency_rejected.inc(self.name, "queue_full")
+            raise Overloaded("queue_full", self._retry_after())
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # the slot is handed over by release(), already counted in in_flight
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not self._granted(waiter):
+                self.timeouts += 1
+                concurrency_rejected.inc(self.name, "queue_timeout")
+                raise Overloaded("queue_timeout", self._retry_after())
+        except asyncio.CancelledError:
+            # client went away; return the slot if it was handed over meanwhile
+            if self._granted(waiter):
+                self._free_slot()
+            raise
+        self.accepted += 1
+
+    def _granted(self, waiter: asyncio.Future) -> bool:
+        if waiter.done() and not waiter.cancelled():
+            return True
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+        return False
+
+    def _admit(self):
+        self.in_flight += 1
+        self.accepted += 1
+        concurrency_in_flight.set(self.name, value=self.in_flight)
+
+    def release(self, latency: float, ok: bool):
+        self._record(latency, ok)
+        self._free_slot()
+
+    def _free_slot(self):
+        if self.in_flight <= int(self.limit) and self._hand_over():
+            return
+        self.in_flight -= 1
+        concurrency_in_flight.set(self.name, value=self.in_flight)
+        self._wake()
+
+    def _hand_over(self) -> bool:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return True
+        return False
+
+    def _wake(self):
+        # the limit may have grown: admit queued requests into free slots
+        while self.in_flight < int(self.limit) and self._waiters:
+            if self._hand_over():
+                self.in_flight += 1
+        concurrency_in_flight.set(self.name, value=self.in_flight)
+
+    def _record(self, latency: float, ok: bool):
+        self.latency = latency if self.latency == 0 else 0.9 * self.latency + 0.1 * latency
+        if not ok or latency > self.target:
+            now = time.monotonic()
+            if now - self._last_decrease >= self.target:
+                self._last_decrease = now
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+        elif self.in_flight * 2 >= self.limit:
+            self.limit = min(self.max_limit, self.limit + 1)
+        concurrency_limit.set(self.name, value=int(self.limit))
+
+    def stats(self) -> dict:
+        return {
+            "limit": int(self.limit),
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "queue_size": self.queue_size,
+            "target_ms": self.target * 1000,
+            "latency_ms": round(self.latency * 1000, 2),
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+        }
+
+
+def make_limiter(name: str) -> AdaptiveLimiter:
+    initial, min_limit, max_limit, queue_size, target_ms = _DEFAULTS[name]
+    prefix = f"CONCURRENCY_{name.upper()}_"
+    return AdaptiveLimiter(
+        name,
+        initial=int(os.getenv(prefix + "LIMIT", initial)),
+        min_limit=int(os.getenv(prefix + "MIN", min_limit)),
+        max_limit=int(os.getenv(prefix + "MAX", max_limit)),
+        queue_size=int(os.getenv(prefix + "QUEUE", queue_size)),
+        target=float(os.getenv(prefix + "TARGET_MS", target_ms)) / 1000,
+        queue_timeout=CONCURRENCY_QUEUE_TIMEOUT_MS / 1000,
+    )
+
+
+limiters: Dict[str, AdaptiveLimiter] = {name: make_limiter(name) for name in _DEFAULTS}
+
+
+def route_class(method: str, path: str) -> Optional[str]:
+    if path.startswith(CONCURRENCY_EXEMPT_PATHS):
+        return None
+    if path.startswith(CONCURRENCY_EXPENSIVE_PATHS):
+        return "expensive"
+    if method in ("GET", "HEAD"):
+        return "read"
+    return "write"
+
+
+class ConcurrencyMiddleware:
+    """
+    ASGI middleware putting every request through the limiter of its route
+    class, so a slow dependency backs up one class instead of the whole
+    event loop. Rejected requests get a 503 with Retry-After.
+    """
+
+    def __init__(self, app, limiters: Dict[str, AdaptiveLimiter] = limiters):
+        self.app = app
+        self.limiters = limiters
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        name = route_class(scope["method"], scope["path"])
+        if name is None:
+            return await self.app(scope, receive, send)
+
+        limiter = self.limiters[name]
+        try:
+            await limiter.acquire()
+        except Overloaded as e:
+            return await self._reject(send, e.retry_after)
+
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            limiter.release(time.perf_counter() - start, ok=status_code < 500)
+
+    async def _reject(self, send, retry_after: int):
+        body = json.dumps({"detail": "Server is busy, please try again later"}).encode()
+        headers: Tuple = (
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(retry_after).encode()),
+        )
+        await send({"type": "http.response.start", "status": 503, "headers": list(headers)})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,100 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, Optional
+from dotenv import load_dotenv
+from fastapi import Request, status
+from fastapi.responses import Response
+
+load_dotenv()
+
+# Cache-Control per read route. The defaults let clients and the CDN keep
+# copies but revalidate every time, which is answered cheaply with a 304.
+CACHE_CONTROL = {
+    "post": os.getenv("CACHE_CONTROL_POST", "public, no-cache"),
+    "posts": os.getenv("CACHE_CONTROL_POSTS", "public, no-cache"),
+    "search": os.getenv("CACHE_CONTROL_SEARCH", "no-store"),
+}
+
+# enough of a post to compute its validators, without the body
+VALIDATOR_PROJECTION = {"version": 1, "updated_at": 1, "created_at": 1}
+
+
+def post_etag(post: dict) -> str:
+    """
+    Strong ETag of a single post. `version` is bumped on every write; posts
+    written before versions existed count as version 0.
+    """
+    return f'"{post["_id"]}.{post.get("version", 0)}"'
+
+
+def page_etag(posts: Iterable[dict], extra: Optional[dict] = None) -> str:
+    """
+    Strong ETag of a list page, from the id and version of every post it was
+    built from (including the look-ahead post that decides `next`) and any
+    other values the page carries.
+    """
+    digest = hashlib.sha1()
+    for post in posts:
+        digest.update(f'{post["_id"]}.{post.get("version", 0)};'.encode())
+    if extra:
+        digest.update(json.dumps(extra, sort_keys=True, default=str).encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def last_modified(posts: Iterable[dict]) -> Optional[datetime]:
+    latest = None
+    for post in posts:
+        stamp = post.get("updated_at") or post.get("created_at")
+        if not stamp:
+            continue
+        modified = datetime.fromisoformat(stamp)
+        if modified.tzinfo is None:
+            modified = modified.replace(tzinfo=timezone.utc)
+        if latest is None or modified > latest:
+            latest = modified
+    return latest
+
+
+def validators(etag: str, modified: Optional[datetime], policy: str) -> dict:
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL[policy]}
+    if modified is not None:
+        headers["Last-Modified"] = format_datetime(modified.astimezone(timezone.utc), usegmt=True)
+    return headers
+
+
+def is_conditional(request: Request) -> bool:
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+
+def not_modified(request: Request, etag: str, modified: Optional[datetime] = None) -> bool:
+    """
+    Evaluate If-None-Match, or If-Modified-Since when there is no
+    If-None-Match (RFC 9110, 13.2.2). Pass modified=None to ignore
+    If-Modified-Since, e.g. for pages, whose newest post says nothing about
+    posts that were removed from them.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        # weak comparison: W/"x" matches "x"
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        # HTTP dates have whole seconds
+        return modified.replace(microsecond=0) <= since
+    return False
+
+
+def not_modified_response(headers: dict) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
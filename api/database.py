@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Optional
+from dotenv import load_dotenv
+import motor.motor_asyncio
+from .metrics import MongoCommandMetrics, MongoPoolMetrics
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+MONGO_URI = os.getenv("MONGO_URI")
+MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "blog_api")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+# connections opened at startup and kept open while idle
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 10))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 5000))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+# 0 leaves the driver default (no limit)
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 0))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 0))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", 0))
+MONGO_PING_TIMEOUT = float(os.getenv("MONGO_PING_TIMEOUT", 2))
+
+
+def client_options() -> dict:
+    options = {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    }
+    if MONGO_SOCKET_TIMEOUT_MS:
+        options["socketTimeoutMS"] = MONGO_SOCKET_TIMEOUT_MS
+    if MONGO_WAIT_QUEUE_TIMEOUT_MS:
+        options["waitQueueTimeoutMS"] = MONGO_WAIT_QUEUE_TIMEOUT_MS
+    if MONGO_MAX_IDLE_TIME_MS:
+        options["maxIdleTimeMS"] = MONGO_MAX_IDLE_TIME_MS
+    return options
+
+
+class Database:
+    """
+    The Mongo client, owned by the app lifespan: connect() creates it, checks
+    the server answers and opens the minimum pool so the first requests after
+    a deploy do not pay for connection setup; close() shuts it down.
+    """
+
+    def __init__(self, uri: Optional[str], name: str, options: dict):
+        self.uri = uri
+        self.name = name
+        self.options = options
+        self.client = None
+        self.db = None
+        self.pool = MongoPoolMetrics()
+        self.pooled = True
+
+    async def connect(self):
+        if self.uri and self.uri.startswith("mongomock://"):
+            # in-process stand-in used by the benchmark suite (pip install mongomock-motor)
+            from mongomock_motor import AsyncMongoMockClient
+            self.client = AsyncMongoMockClient()
+            self.pooled = False
+        else:
+            self.client = motor.motor_asyncio.AsyncIOMotorClient(
+                self.uri, event_listeners=[MongoCommandMetrics(), self.pool], **self.options
+            )
+        self.db = self.client[self.name]
+        # fail startup on a bad URI or unreachable server instead of on the first request
+        latency = await self.ping()
+        await self.warmup()
+        logger.info("Connected to MongoDB", extra={
+            "database": self.name, "ping_ms": round(latency * 1000, 2), "open_connections": self.pool.open,
+        })
+
+    async def warmup(self):
+        # the driver fills minPoolSize in the background; concurrent pings
+        # each check out a connection, so the pool is open before serving
+        size = self.options.get("minPoolSize", 0)
+        if self.pooled and size:
+            await asyncio.gather(*(self.client.admin.command("ping") for _ in range(size)))
+
+    async def ping(self, timeout: float = MONGO_PING_TIMEOUT) -> float:
+        """
+        Round-trip a ping and return its latency in seconds.
+        """
+        start = time.perf_counter()
+        await asyncio.wait_for(self.client.admin.command("ping"), timeout)
+        return time.perf_counter() - start
+
+    def pool_stats(self) -> dict:
+        max_size = self.options.get("maxPoolSize") or 0
+        return {
+            "max_size": max_size,
+            "min_size": self.options.get("minPoolSize", 0),
+            "open": self.pool.open,
+            "in_use": self.pool.in_use,
+            "utilization": round(self.pool.in_use / max_size, 3) if max_size and self.pooled else None,
+            "checkout_failures": self.pool.checkout_failures,
+        }
+
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+        self.client = None
+        self.db = None
+
+
+class DatabaseProxy:
+    """
+    What the rest of the app imports as `db`. Modules bind it at import time,
+    before the lifespan has connected, so every lookup goes to the database
+    of the current client.
+    """
+
+    def __init__(self, database: Database):
+        self._database = database
+
+    def _current(self):
+        if self._database.db is None:
+            raise RuntimeError("MongoDB is not connected; it is opened by the app lifespan")
+        return self._database.db
+
+    def __getitem__(self, name):
+        return self._current()[name]
+
+    def __getattr__(self, name):
+        return getattr(self._current(), name)
+
+
+database = Database(MONGO_URI, MONGO_DB_NAME, client_options())
+db = DatabaseProxy(database)
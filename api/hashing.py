@@ -0,0 +1,89 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+from . import utils
+from .metrics import password_latency
+from .profiling import record_span
+
+load_dotenv()
+
+# 0 keeps the old behaviour of hashing inline on the event loop
+HASH_POOL_SIZE = int(os.getenv("HASH_POOL_SIZE", os.cpu_count() or 1))
+# hashing jobs allowed to wait for a worker before new ones are shed with a 503
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", 64))
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt hashing and verification in a process pool so a burst of
+    logins does not block the event loop for every other request.
+    """
+
+    def __init__(self, pool_size: int, max_pending: int):
+        self.pool_size = pool_size
+        self.max_pending = max_pending
+        self.pending = 0  # jobs running or waiting for a worker
+        self._executor = None
+
+    async def start(self):
+        """
+        Spawn the worker processes and warm them up, so the first logins
+        after a deploy do not pay for process start and passlib backend setup.
+        """
+        if self.pool_size > 0 and self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.pool_size,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        await self.warmup()
+
+    async def warmup(self):
+        jobs = max(self.pool_size, 1)
+        await asyncio.gather(*(
+            self._run("warmup", utils.get_password_hash, "warmup", shed=False) for _ in range(jobs)
+        ))
+
+    async def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    @property
+    def queued(self) -> int:
+        # one job per worker is running, the rest are waiting
+        return max(0, self.pending - self.pool_size)
+
+    async def _run(self, operation: str, fn, *args, shed: bool = True):
+        if shed and self.queued >= self.max_pending:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please try again later",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        start = time.perf_counter()
+        try:
+            if self.pool_size <= 0:
+                return fn(*args)
+            if self._executor is None:
+                await self.start()
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, fn, *args)
+        finally:
+            self.pending -= 1
+            elapsed = time.perf_counter() - start
+            password_latency.observe(elapsed, operation)
+            record_span("bcrypt", elapsed, operation)
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", utils.get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run("verify", utils.verify_password, plain_password, hashed_password)
+
+
+hasher = PasswordHasher(HASH_POOL_SIZE, HASH_MAX_PENDING)
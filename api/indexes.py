@@ -0,0 +1,66 @@
+import logging
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Every index the API relies on, by collection. Indexes found in the database
+# but not listed here are reported as extra; they are never dropped.
+INDEXES = {
+    "users": [
+        IndexModel([("name", ASCENDING)], name="name_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        # polled by api.changes when change streams are unavailable
+        IndexModel([("updated_at", ASCENDING)], name="updated_at"),
+    ],
+    "blogPost": [
+        # one (field, _id) index per sortable field in api.pagination
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="created_at_id"),
+        IndexModel([("title", DESCENDING), ("_id", DESCENDING)], name="title_id"),
+        # GET /blog/author/{author_id}; also serves any author_id-only query
+        IndexModel([("author_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+                   name="author_id_created_at_id"),
+        IndexModel([("updated_at", ASCENDING)], name="updated_at"),
+        IndexModel([("title", TEXT), ("body", TEXT)], name="title_body_text",
+                   weights={"title": 3, "body": 1}),
+    ],
+    "otp": [
+        # codes are keyed by user id in _id; this removes them once expired
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "rateLimits": [
+        # buckets of the mongo rate limit backend, dropped once idle long enough to be full again
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+}
+
+
+async def ensure_indexes(db) -> dict:
+    """
+    Create any missing indexes and compare what exists with INDEXES.
+    Safe to run on every startup: creating an existing index is a no-op.
+
+    Returns {collection: {"missing": [...], "extra": [...]}}.
+    """
+    report = {}
+    for collection, models in INDEXES.items():
+        for model in models:
+            name = model.document["name"]
+            try:
+                await db[collection].create_indexes([model])
+            except OperationFailure as e:
+                # e.g. duplicate values blocking a unique index, or an index
+                # with the same keys but different options
+                logger.error("Could not create index %s.%s: %s", collection, name, e)
+
+        existing = set(await db[collection].index_information())
+        wanted = {model.document["name"] for model in models} | {"_id_"}
+        report[collection] = {
+            "missing": sorted(wanted - existing),
+            "extra": sorted(existing - wanted),
+        }
+        if report[collection]["missing"]:
+            logger.warning("Missing indexes on %s: %s", collection, report[collection]["missing"])
+        if report[collection]["extra"]:
+            logger.info("Extra indexes on %s: %s", collection, report[collection]["extra"])
+    return report
@@ -0,0 +1,88 @@
+import asyncio
+import logging
+import os
+from typing import Any, Dict, List, Optional, Set
+from dotenv import load_dotenv
+from .schemas import db
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+LOADER_WINDOW_MS = float(os.getenv("LOADER_WINDOW_MS", 2))
+LOADER_MAX_BATCH = int(os.getenv("LOADER_MAX_BATCH", 100))
+
+
+class BatchLoader:
+    """
+    Micro-batching find-by-id for one collection. load(id) calls made by
+    any requests within `window` seconds, or until `max_batch` distinct ids
+    are waiting, are answered by a single find({"_id": {"$in": ids}}).
+    Each caller gets the document or None.
+
+    Nothing is kept after a batch is answered, so there is no staleness
+    beyond the window. Callers waiting on the same id share one document
+    and must not modify it.
+    """
+
+    def __init__(self, collection: str, projection: Optional[dict] = None,
+                 window: float = LOADER_WINDOW_MS / 1000, max_batch: int = LOADER_MAX_BATCH):
+        self.collection = collection
+        self.projection = projection
+        self.window = window
+        self.max_batch = max_batch
+        self.batches = 0
+        self.loads = 0
+        self._pending: Dict[Any, List[asyncio.Future]] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def load(self, id) -> Optional[dict]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.setdefault(id, []).append(future)
+        self.loads += 1
+        if len(self._pending) >= self.max_batch:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._dispatch)
+        return await future
+
+    async def load_many(self, ids: List) -> List[Optional[dict]]:
+        return list(await asyncio.gather(*(self.load(id) for id in ids)))
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        if not batch:
+            return
+        self.batches += 1
+        task = asyncio.ensure_future(self._fetch(batch))
+        # keep a reference until it finishes
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _fetch(self, batch: Dict[Any, List[asyncio.Future]]):
+        try:
+            docs = await db[self.collection].find({"_id": {"$in": list(batch)}}, self.projection).to_list(None)
+        except Exception as e:
+            for futures in batch.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+        found = {doc["_id"]: doc for doc in docs}
+        for id, futures in batch.items():
+            doc = found.get(id)
+            for future in futures:
+                if not future.done():
+                    future.set_result(doc)
+
+    def stats(self) -> dict:
+        return {"loads": self.loads, "batches": self.batches}
+
+
+post_loader = BatchLoader("blogPost")
+user_loader = BatchLoader("users")
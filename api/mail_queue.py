@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import time
+from email.message import EmailMessage
+from email.utils import parseaddr
+from typing import List, Optional
+
+import aiosmtplib
+from fastapi import HTTPException, status
+from .metrics import mail_latency
+
+logger = logging.getLogger(__name__)
+
+
+class SmtpSettings:
+    def __init__(self, hostname: str, port: int, username: Optional[str] = None,
+                 password: Optional[str] = None, start_tls: bool = True,
+                 use_tls: bool = False, validate_certs: bool = True,
+                 timeout: float = 30.0):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.start_tls = start_tls
+        self.use_tls = use_tls
+        self.validate_certs = validate_certs
+        self.timeout = timeout
+
+
+class MailQueue:
+    """
+    In-process outbound mail queue.
+
+    Request handlers enqueue fully rendered messages and return immediately.
+    Worker tasks keep one SMTP connection each open between sends, take up to
+    `batch_size` queued messages at a time and send them over that connection,
+    retrying transient failures with exponential backoff.
+
+    `sender` is the From address the messages are built with; start()
+    refuses to run without a valid one, so a missing MAIL_FROM fails startup
+    rather than every request that sends mail.
+    """
+
+    def __init__(self, settings: SmtpSettings, sender: Optional[str] = None, maxsize: int = 1000,
+                 workers: int = 2, batch_size: int = 20, max_retries: int = 3, backoff: float = 1.0,
+                 suppress_send: bool = False):
+        self.settings = settings
+        self.sender = sender
+        self.maxsize = maxsize
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.suppress_send = suppress_send
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._accepting = False
+
+    @property
+    def queue(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.maxsize)
+        return self._queue
+
+    async def start(self):
+        if self._tasks:
+            return
+        if not self.sender or "@" not in parseaddr(self.sender)[1]:
+            raise ValueError(f"A valid sender address (MAIL_FROM) is required, got {self.sender!r}")
+        self._accepting = True
+        self._tasks = [asyncio.create_task(self._worker(n)) for n in range(self.workers)]
+
+    def enqueue(self, message: EmailMessage):
+        """
+        Queue a message for delivery. Raise a 503 when the queue is full
+        rather than letting the request wait on SMTP.
+        """
+        if not self._accepting:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Mail service is not running",
+            )
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Mail queue is full, please try again later",
+                headers={"Retry-After": "5"},
+            )
+
+    async def put(self, message: EmailMessage):
+        """
+        Queue a message, waiting for room when the queue is full. For bulk
+        sends, where the producer should slow down to the delivery rate
+        instead of failing.
+        """
+        if not self._accepting:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Mail service is not running",
+            )
+        await self.queue.put(message)
+
+    async def drain(self, timeout: float = 30.0):
+        """
+        Stop accepting new messages, wait up to `timeout` seconds for the
+        queued ones to be sent, then stop the workers.
+        """
+        self._accepting = False
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Mail queue drain timed out with %d messages left", self.queue.qsize())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        s = self.settings
+        smtp = aiosmtplib.SMTP(
+            hostname=s.hostname,
+            port=s.port,
+            use_tls=s.use_tls,
+            start_tls=s.start_tls,
+            validate_certs=s.validate_certs,
+            timeout=s.timeout,
+        )
+        await smtp.connect()
+        if s.username:
+            await smtp.login(s.username, s.password)
+        return smtp
+
+    async def _close(self, smtp: Optional[aiosmtplib.SMTP]):
+        if smtp is None or not smtp.is_connected:
+            return
+        try:
+            await smtp.quit()
+        except aiosmtplib.SMTPException:
+            smtp.close()
+
+    async def _worker(self, n: int):
+        smtp = None
+        try:
+            while True:
+                batch = [await self.queue.get()]
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except asyncio.QueueEmpty:
+                        break
+                try:
+                    for message in batch:
+                        try:
+                            smtp = await self._deliver(smtp, message)
+                        except Exception:
+                            # a bad message must not take the worker, and with
+                            # it the queue, down; drop the connection to be safe
+                            logger.exception("Dropping mail to %s after an unexpected error", message["To"])
+                            if smtp is not None:
+                                smtp.close()
+                            smtp = None
+                finally:
+                    for _ in batch:
+                        self.queue.task_done()
+        finally:
+            await self._close(smtp)
+
+    async def _deliver(self, smtp: Optional[aiosmtplib.SMTP], message: EmailMessage):
+        """
+        Send one message, reconnecting and backing off between attempts.
+        Return the connection to reuse for the next message.
+        """
+        if self.suppress_send:
+            return smtp
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                if smtp is None or not smtp.is_connected:
+                    smtp = await self._connect()
+                await smtp.send_message(message)
+                mail_latency.observe(time.perf_counter() - start, "ok")
+                return smtp
+            except aiosmtplib.SMTPRecipientsRefused as e:
+                # permanent, and the server has reset the transaction
+                mail_latency.observe(time.perf_counter() - start, "error")
+                logger.error("Recipients refused for %s: %s", message["To"], e)
+                return smtp
+            except aiosmtplib.SMTPResponseException as e:
+                mail_latency.observe(time.perf_counter() - start, "error")
+                if e.code >= 500:
+                    logger.error("Permanent SMTP failure for %s: %s", message["To"], e)
+                    return smtp
+                error = e
+            except (aiosmtplib.SMTPException, OSError) as e:
+                mail_latency.observe(time.perf_counter() - start, "error")
+                error = e
+            await self._close(smtp)
+            smtp = None
+            if attempt < self.max_retries:
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+        logger.error("Giving up on mail to %s after %d attempts: %s",
+                     message["To"], self.max_retries + 1, error)
+        return None
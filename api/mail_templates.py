@@ -0,0 +1,126 @@
+import logging
+from pathlib import Path
+from typing import Dict, List, Union
+from jinja2 import Environment, FileSystemLoader, Template, nodes, select_autoescape
+from markupsafe import escape
+
+logger = logging.getLogger(__name__)
+
+
+class CompiledTemplate:
+    """
+    A template that is only static text and `{{ name }}` substitutions,
+    flattened to its static chunks: `chunks[i]` comes before `slots[i]` and
+    the last chunk closes the document. Rendering is one join, with no Jinja
+    runtime involved.
+    """
+
+    def __init__(self, name: str, chunks: List[str], slots: List[str], autoescape: bool):
+        self.name = name
+        self.chunks = chunks
+        self.slots = slots
+        self.autoescape = autoescape
+
+    def _value(self, values: dict, slot: str) -> str:
+        # same output as Jinja's default Undefined and autoescape
+        if slot not in values:
+            return ""
+        return str(escape(values[slot])) if self.autoescape else str(values[slot])
+
+    def render(self, values: dict) -> str:
+        out = [self.chunks[0]]
+        for slot, chunk in zip(self.slots, self.chunks[1:]):
+            out.append(self._value(values, slot))
+            out.append(chunk)
+        return "".join(out)
+
+    def bind(self, values: dict) -> "CompiledTemplate":
+        """
+        Fold the given values into the static chunks, leaving only the other
+        slots to fill per render. Used for batches where most of the body is
+        the same for every recipient.
+        """
+        chunks = [self.chunks[0]]
+        slots = []
+        for slot, chunk in zip(self.slots, self.chunks[1:]):
+            if slot in values:
+                chunks[-1] += self._value(values, slot) + chunk
+            else:
+                slots.append(slot)
+                chunks.append(chunk)
+        return CompiledTemplate(self.name, chunks, slots, self.autoescape)
+
+
+class JinjaTemplate:
+    """
+    Fallback with the CompiledTemplate interface for templates that use
+    control structures, filters or anything else beyond plain substitution.
+    """
+
+    def __init__(self, template: Template, bound: dict = None):
+        self.name = template.name
+        self.template = template
+        self.bound = bound or {}
+
+    def render(self, values: dict) -> str:
+        return self.template.render({**self.bound, **values})
+
+    def bind(self, values: dict) -> "JinjaTemplate":
+        return JinjaTemplate(self.template, {**self.bound, **values})
+
+
+MailTemplate = Union[CompiledTemplate, JinjaTemplate]
+
+
+class MailTemplates:
+    """
+    The mail templates of one directory, compiled once (normally at startup)
+    and kept for the life of the process.
+    """
+
+    def __init__(self, directory: Path):
+        self.env = Environment(
+            loader=FileSystemLoader(directory),
+            autoescape=select_autoescape(["html"]),
+        )
+        self._templates: Dict[str, MailTemplate] = {}
+
+    def load(self):
+        for name in self.env.list_templates():
+            self._templates[name] = self.compile(name)
+        compiled = sum(isinstance(t, CompiledTemplate) for t in self._templates.values())
+        logger.info("Loaded %d mail templates, %d precompiled", len(self._templates), compiled)
+
+    def get(self, name: str) -> MailTemplate:
+        template = self._templates.get(name)
+        if template is None:
+            template = self._templates[name] = self.compile(name)
+        return template
+
+    def render(self, name: str, values: dict) -> str:
+        return self.get(name).render(values)
+
+    def compile(self, name: str) -> MailTemplate:
+        source, filename, _ = self.env.loader.get_source(self.env, name)
+        jinja_template = self.env.get_template(name)
+        chunks = [""]
+        slots = []
+        for node in self.env.parse(source, name, filename).body:
+            if not isinstance(node, nodes.Output):
+                return JinjaTemplate(jinja_template)
+            for child in node.nodes:
+                if isinstance(child, nodes.TemplateData):
+                    chunks[-1] += child.data
+                elif isinstance(child, nodes.Name):
+                    slots.append(child.name)
+                    chunks.append("")
+                else:
+                    return JinjaTemplate(jinja_template)
+        autoescape = self.env.autoescape(name) if callable(self.env.autoescape) else self.env.autoescape
+        compiled = CompiledTemplate(name, chunks, slots, autoescape)
+        # never trade correctness for speed: the flattened form must match Jinja
+        sample = {slot: f'<{slot} & "x">' for slot in slots}
+        if compiled.render(sample) != jinja_template.render(sample):
+            logger.warning("Mail template %s does not flatten cleanly, rendering it with Jinja", name)
+            return JinjaTemplate(jinja_template)
+        return compiled
@@ -1,16 +1,97 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from .routes import users, auth, password_reset,blog_content, otp_verification
+from fastapi.responses import JSONResponse, PlainTextResponse
+from .cache import blog_cache
+from .changes import change_listener
+from .concurrency import CONCURRENCY_LIMIT_ENABLED, ConcurrencyMiddleware, limiters
+from .database import database
+from .hashing import hasher
+from .indexes import ensure_indexes
+from .loader import post_loader, user_loader
+from .log import RequestIdMiddleware, configure_logging, shutdown_logging
+from .metrics import REGISTRY, MetricsMiddleware
+from .migrations import run_migrations
+from .otp_store import otp_store
+from .profiling import PROFILING_ENABLED, PROFILING_SECRET, ProfilingMiddleware
+from .ratelimit import RateLimitHeadersMiddleware
+from .schemas import db
+from .search import search_backend
+from .send_mail import mail_queue, mail_templates
+from .routes import users, auth, password_reset,blog_bulk,blog_content, otp_verification
 
 
-app = FastAPI()
+configure_logging()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    configure_logging()
+    await database.connect()
+    app.state.index_report = await ensure_indexes(db)
+    app.state.migration_report = await run_migrations(db)
+    await search_backend.start(db)
+    await change_listener.start()
+    await otp_store.start()
+    await hasher.start()
+    mail_templates.load()
+    await mail_queue.start()
+    yield
+    await mail_queue.drain()
+    await hasher.shutdown()
+    await change_listener.stop()
+    database.close()
+    shutdown_logging()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(RateLimitHeadersMiddleware)
+if CONCURRENCY_LIMIT_ENABLED:
+    # inside MetricsMiddleware, so shed requests show up as 503s
+    app.add_middleware(ConcurrencyMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(RequestIdMiddleware)
+if PROFILING_ENABLED and PROFILING_SECRET:
+    # outermost, so the profile covers every other middleware
+    app.add_middleware(ProfilingMiddleware)
 
 
 app.include_router(users.router)
 app.include_router(auth.router)
 app.include_router(password_reset.router)
+app.include_router(blog_bulk.router)
 app.include_router(blog_content.router)
 app.include_router(otp_verification.router)
 
 @app.get("/")
 def get():
-    return {"msg": "Hello World"}
\ No newline at end of file
+    return {"msg": "Hello World"}
+
+@app.get("/healthz", include_in_schema=False)
+def healthz():
+    # liveness only: the process is up and serving
+    return {"status": "ok"}
+
+@app.get("/readyz", include_in_schema=False)
+async def readyz():
+    try:
+        latency = await database.ping()
+    except Exception as e:
+        return JSONResponse(
+            {"status": "unavailable", "mongo": {"error": str(e) or type(e).__name__, "pool": database.pool_stats()}},
+            status_code=503,
+        )
+    return {"status": "ok", "mongo": {"ping_ms": round(latency * 1000, 2), "pool": database.pool_stats()}}
+
+@app.get("/cache/stats")
+async def cache_stats():
+    stats = await blog_cache.stats()
+    stats["loaders"] = {"blogPost": post_loader.stats(), "users": user_loader.stats()}
+    return stats
+
+@app.get("/concurrency", include_in_schema=False)
+def concurrency():
+    return {"enabled": CONCURRENCY_LIMIT_ENABLED, "limiters": {name: l.stats() for name, l in limiters.items()}}
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
\ No newline at end of file
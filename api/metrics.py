@@ -0,0 +1,279 @@
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+
+from pymongo import monitoring
+from starlette.routing import Match
+from .profiling import record_span
+
+# seconds; tuned for an API whose requests sit between a millisecond and a few seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def _samples(self):
+        return [f"{self.name}{_labels(self.labelnames, k)} {v}" for k, v in list(self._values.items())]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value: float):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (non-cumulative, +Inf last), sum, count]
+        self._values: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def _samples(self):
+        lines = []
+        for labels, (counts, total, count) in list(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+http_requests = REGISTRY.register(Counter(
+    "http_requests_total", "HTTP requests handled", ("method", "route", "status")))
+http_latency = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route")))
+http_in_flight = REGISTRY.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled", ("method",)))
+mongo_latency = REGISTRY.register(Histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency", ("collection", "command", "outcome")))
+mail_latency = REGISTRY.register(Histogram(
+    "mail_send_duration_seconds", "SMTP send latency per message", ("outcome",)))
+password_latency = REGISTRY.register(Histogram(
+    "password_hash_duration_seconds", "bcrypt hash/verify latency, including pool wait", ("operation",)))
+
+
+def route_path(scope) -> str:
+    """
+    Path template of the route serving `scope`. Requests answered before
+    routing, such as those shed by ConcurrencyMiddleware, are matched
+    against the app's routes here, so only paths no route serves are
+    "unmatched".
+    """
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    app = scope.get("app")
+    for route in getattr(getattr(app, "router", None), "routes", ()):
+        match, _ = route.matches(scope)
+        if match != Match.NONE:
+            return getattr(route, "path", "unmatched")
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency, status and in-flight count per route.
+    Routes are labelled by their path template so ids do not explode the
+    number of series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_in_flight.inc(method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_in_flight.dec(method)
+            path = route_path(scope)
+            http_latency.observe(elapsed, method, path)
+            http_requests.inc(method, path, str(status_code))
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """
+    PyMongo command listener timing every command by collection and name.
+    """
+
+    def __init__(self):
+        self._pending: Dict[Tuple, Tuple[str, str]] = {}
+
+    def started(self, event):
+        command_name = event.command_name
+        if command_name == "getMore":
+            collection = event.command.get("collection", "-")
+        else:
+            collection = event.command.get(command_name)
+            if not isinstance(collection, str):
+                collection = "-"
+        self._pending[(event.connection_id, event.request_id)] = (collection, command_name)
+
+    def succeeded(self, event):
+        self._finish(event, "ok")
+
+    def failed(self, event):
+        self._finish(event, "error")
+
+    def _finish(self, event, outcome: str):
+        labels = self._pending.pop((event.connection_id, event.request_id), None)
+        if labels is not None:
+            mongo_latency.observe(event.duration_micros / 1e6, labels[0], labels[1], outcome)
+            record_span("mongo", event.duration_micros / 1e6, f"{labels[0]}.{labels[1]}")
+
+
+mongo_pool_connections = REGISTRY.register(Gauge(
+    "mongo_pool_connections", "MongoDB connections per server, open and checked out", ("address", "state")))
+mongo_pool_checkout_failures = REGISTRY.register(Counter(
+    "mongo_pool_checkout_failures_total", "Failed MongoDB connection checkouts", ("address", "reason")))
+
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    """
+    PyMongo pool listener counting open and checked-out connections across
+    all servers, for /readyz and the mongo_pool_* series.
+    """
+
+    def __init__(self):
+        self.open = 0
+        self.in_use = 0
+        self.checkout_failures = 0
+
+    def _address(self, event) -> str:
+        host, port = event.address
+        return f"{host}:{port}"
+
+    def connection_created(self, event):
+        self.open += 1
+        mongo_pool_connections.inc(self._address(event), "open")
+
+    def connection_closed(self, event):
+        self.open -= 1
+        mongo_pool_connections.dec(self._address(event), "open")
+
+    def connection_checked_out(self, event):
+        self.in_use += 1
+        mongo_pool_connections.inc(self._address(event), "in_use")
+
+    def connection_checked_in(self, event):
+        self.in_use -= 1
+        mongo_pool_connections.dec(self._address(event), "in_use")
+
+    def connection_check_out_failed(self, event):
+        self.checkout_failures += 1
+        mongo_pool_checkout_failures.inc(self._address(event), str(event.reason))
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+
+concurrency_limit = REGISTRY.register(Gauge(
+    "concurrency_limit", "Current adaptive concurrency limit per route class", ("route_class",)))
+concurrency_in_flight = REGISTRY.register(Gauge(
+    "concurrency_in_flight", "Requests admitted by the concurrency limiter per route class", ("route_class",)))
+concurrency_rejected = REGISTRY.register(Counter(
+    "concurrency_rejected_total", "Requests shed by the concurrency limiter", ("route_class", "reason")))
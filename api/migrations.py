@@ -0,0 +1,88 @@
+"""
+Data backfills, run by the app lifespan after the indexes are in place.
+Each one only touches documents that still lack what it adds, so once done
+it is a single empty query, and running it from every worker on every
+startup is safe.
+"""
+import asyncio
+import logging
+from typing import List, Tuple
+from .utils import summarize
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+
+async def _update_batch(collection, updates: List[Tuple[dict, dict]]) -> int:
+    results = await asyncio.gather(*(collection.update_one(query, update) for query, update in updates))
+    return sum(result.modified_count for result in results)
+
+
+async def backfill_post_summaries(db, batch_size: int = BATCH_SIZE) -> int:
+    """
+    Store excerpt and word_count on posts written before they existed, so
+    list views can project them as plain fields.
+    """
+    missing = {"$or": [{"excerpt": {"$exists": False}}, {"word_count": {"$exists": False}}]}
+    updated, batch = 0, []
+    async for post in db["blogPost"].find(missing, {"body": 1}).batch_size(batch_size):
+        # still filtered on the fields being missing, so a concurrent edit,
+        # which stores them for its new body, is never overwritten
+        batch.append(({"_id": post["_id"], **missing}, {"$set": summarize(post.get("body") or "")}))
+        if len(batch) >= batch_size:
+            updated += await _update_batch(db["blogPost"], batch)
+            batch = []
+    return updated + await _update_batch(db["blogPost"], batch)
+
+
+async def count_posts(db, user_id) -> int:
+    """
+    Store the post count of a user who has none, safely against concurrent
+    creates and deletes: those only $inc a count that exists, so one whose
+    write lands before the count but whose $inc lands after the $set is
+    counted twice, and one landing between the count and the $set is lost.
+    The stored value is therefore read back and compared with a fresh count,
+    and corrected with a write guarded on the value read, until they agree.
+    """
+    query = {"author_id": str(user_id)}
+    stored = {"$exists": False}
+    count = await db["blogPost"].count_documents(query)
+    while True:
+        await db["users"].update_one({"_id": user_id, "post_count": stored}, {"$set": {"post_count": count}})
+        user = await db["users"].find_one({"_id": user_id}, {"post_count": 1})
+        if user is None:
+            return 0
+        count = await db["blogPost"].count_documents(query)
+        if user.get("post_count") == count:
+            return count
+        stored = user.get("post_count", {"$exists": False})
+
+
+async def backfill_post_counts(db, batch_size: int = BATCH_SIZE) -> int:
+    """
+    Store post_count on users registered before it existed.
+    """
+    updated = 0
+    async for user in db["users"].find({"post_count": {"$exists": False}}, {"_id": 1}).batch_size(batch_size):
+        await count_posts(db, user["_id"])
+        updated += 1
+    return updated
+
+
+MIGRATIONS = (
+    ("post_summaries", backfill_post_summaries),
+    ("post_counts", backfill_post_counts),
+)
+
+
+async def run_migrations(db) -> dict:
+    """
+    Run every backfill in order. Returns {name: documents updated}.
+    """
+    report = {}
+    for name, migration in MIGRATIONS:
+        report[name] = await migration(db)
+        if report[name]:
+            logger.info("Migration %s updated %d documents", name, report[name])
+    return report
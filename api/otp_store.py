@@ -0,0 +1,116 @@
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+from dotenv import load_dotenv
+from pymongo import ReturnDocument
+from .schemas import db
+
+load_dotenv()
+
+OTP_BACKEND = os.getenv("OTP_BACKEND", "mongo")
+OTP_TTL_SECONDS = int(os.getenv("OTP_TTL_SECONDS", 600))
+OTP_MAX_ATTEMPTS = int(os.getenv("OTP_MAX_ATTEMPTS", 5))
+
+# outcomes of OtpStore.verify
+VERIFIED = "verified"
+INVALID = "invalid"
+LOCKED = "locked"
+
+
+class MongoOtpStore:
+    """
+    One active code per user, stored under the user's id so issuing a new
+    code replaces the old one. A TTL index on `expires_at` removes expired
+    codes; the expiry is also checked on read because the TTL monitor only
+    runs once a minute.
+    """
+
+    def __init__(self, ttl: int, max_attempts: int):
+        self.ttl = ttl
+        self.max_attempts = max_attempts
+
+    async def start(self):
+        # codes from before the TTL index have no expiry and are never valid
+        await db["otp"].delete_many({"expires_at": {"$exists": False}})
+
+    async def issue(self, user_id: str, code: str):
+        await db["otp"].replace_one(
+            {"_id": user_id},
+            {
+                "otp": code,
+                "attempts": 0,
+                "expires_at": datetime.now(timezone.utc) + timedelta(seconds=self.ttl),
+            },
+            upsert=True,
+        )
+
+    async def verify(self, user_id: str, code: str) -> str:
+        """
+        Consume the code if it matches, in one atomic find_one_and_delete.
+        A wrong code costs the user one attempt.
+        """
+        now = datetime.now(timezone.utc)
+        consumed = await db["otp"].find_one_and_delete(
+            {"_id": user_id, "otp": code, "expires_at": {"$gt": now}, "attempts": {"$lt": self.max_attempts}},
+            projection={"_id": 1},
+        )
+        if consumed is not None:
+            return VERIFIED
+        failed = await db["otp"].find_one_and_update(
+            {"_id": user_id, "expires_at": {"$gt": now}},
+            {"$inc": {"attempts": 1}},
+            projection={"attempts": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        if failed is not None and failed["attempts"] >= self.max_attempts:
+            return LOCKED
+        return INVALID
+
+
+class MemoryOtpStore:
+    """
+    Same contract as MongoOtpStore, kept in the process. Only for single-node
+    deployments: codes are lost on restart and not shared between workers.
+    """
+
+    sweep_every = 1000
+
+    def __init__(self, ttl: int, max_attempts: int):
+        self.ttl = ttl
+        self.max_attempts = max_attempts
+        # user id -> [code, attempts, expires at (monotonic)]
+        self._codes: Dict[str, List] = {}
+        self._issued = 0
+
+    async def start(self):
+        pass
+
+    async def issue(self, user_id: str, code: str):
+        self._codes[user_id] = [code, 0, time.monotonic() + self.ttl]
+        self._issued += 1
+        if self._issued % self.sweep_every == 0:
+            now = time.monotonic()
+            for key in [k for k, v in self._codes.items() if v[2] <= now]:
+                del self._codes[key]
+
+    async def verify(self, user_id: str, code: str) -> str:
+        entry = self._codes.get(user_id)
+        if entry is None or entry[2] <= time.monotonic():
+            return INVALID
+        if entry[1] < self.max_attempts and entry[0] == code:
+            del self._codes[user_id]
+            return VERIFIED
+        entry[1] += 1
+        return LOCKED if entry[1] >= self.max_attempts else INVALID
+
+
+def make_otp_store(name: str = OTP_BACKEND):
+    if name == "mongo":
+        return MongoOtpStore(OTP_TTL_SECONDS, OTP_MAX_ATTEMPTS)
+    if name == "memory":
+        return MemoryOtpStore(OTP_TTL_SECONDS, OTP_MAX_ATTEMPTS)
+    raise ValueError(f"Unknown OTP_BACKEND: {name}")
+
+
+otp_store = make_otp_store()
@@ -0,0 +1,98 @@
+import base64
+import binascii
+import json
+import os
+from typing import Literal, Optional
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+
+load_dotenv()
+
+# Every sortable field must be backed by a ({field: -1, _id: -1}) index on blogPost
+SortField = Literal["created_at", "title"]
+SORTABLE_FIELDS = ("created_at", "title")
+
+MAX_PAGE_SIZE = int(os.getenv("BLOG_MAX_PAGE_SIZE", 100))
+
+# what a cursor may carry per sort field; a sort value of None comes from a
+# post missing the field. Anything else (a dict in particular) would be read
+# by Mongo as a query operator once it is put into keyset_filter's clauses.
+SCALAR_TYPES = (str, int, float, type(None))
+CURSOR_TYPES = {
+    "created_at": (str, type(None)),
+    "title": (str, type(None)),
+}
+
+
+def encode_cursor(field: str, value, id) -> str:
+    """
+    Pack the sort position of the last item on a page into an opaque token.
+    """
+    raw = json.dumps([field, value, str(id)], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, field: str, types: Optional[tuple] = None):
+    """
+    Unpack a token made by encode_cursor. Raise a 400 if it is malformed,
+    was issued for a different sort field, or carries a value that is not
+    one of `types` (by default CURSOR_TYPES[field], or any scalar) or an id
+    that is not a string.
+    """
+    invalid = HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Invalid pagination cursor",
+    )
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_field, value, id = json.loads(raw)
+    except (binascii.Error, ValueError, TypeError):
+        raise invalid
+    if cursor_field != field:
+        raise invalid
+    types = types or CURSOR_TYPES.get(field, SCALAR_TYPES)
+    # bool is an int, but never a sort value
+    if not isinstance(id, str) or isinstance(value, bool) or not isinstance(value, types):
+        raise invalid
+    return value, id
+
+
+def keyset_filter(field: str, cursor: Optional[str], query: Optional[dict] = None, direction: int = -1) -> dict:
+    """
+    Extend `query` so it only matches items after the cursor position for a
+    (field, _id) sort in `direction`. Without a cursor the query is returned
+    as is.
+    """
+    query = dict(query or {})
+    if cursor is None:
+        return query
+    value, id = decode_cursor(cursor, field)
+    op = "$lt" if direction < 0 else "$gt"
+    after = {"$or": [
+        {field: {op: value}},
+        {field: value, "_id": {op: id}},
+    ]}
+    if query:
+        return {"$and": [query, after]}
+    return after
+
+
+def descending(field: str) -> list:
+    return [(field, -1), ("_id", -1)]
+
+
+def ascending(field: str) -> list:
+    return [(field, 1), ("_id", 1)]
+
+
+def page(docs: list, field: str, limit: int) -> dict:
+    """
+    Build a page from up to `limit + 1` docs; the extra doc only signals
+    that another page exists.
+    """
+    items = docs[:limit]
+    next = None
+    if len(docs) > limit:
+        last = items[-1]
+        next = encode_cursor(field, last.get(field), last["_id"])
+    return {"items": items, "next": next}
@@ -0,0 +1,267 @@
+"""
+On-demand profiling of single requests.
+
+With PROFILING_ENABLED and a PROFILING_SECRET set, a request carrying a
+valid signed token in the X-Profile header (or the `_profile` query
+parameter) is run under a sampling profiler and records spans for Mongo
+commands, password hashing, template rendering, mail queueing and response
+serialization. Other requests take the plain path.
+
+Make a token valid for ten minutes:
+
+    python -m api.profiling 600
+
+Then:
+
+    curl -H "X-Profile: $TOKEN" localhost:8000/blog/
+    curl -H "X-Profile: $TOKEN" -H "X-Profile-Output: inline" localhost:8000/blog/
+
+The first writes PROFILING_DIR/<id>.speedscope.json (open it at
+https://www.speedscope.app) and <id>.spans.json; the second returns both
+in place of the response body. Every profiled response has a
+Server-Timing header with the span totals.
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILING_SECRET = os.getenv("PROFILING_SECRET", "")
+# file or inline; a request can override it with X-Profile-Output
+PROFILING_OUTPUT = os.getenv("PROFILING_OUTPUT", "file")
+PROFILING_DIR = Path(os.getenv("PROFILING_DIR", "profiles"))
+PROFILING_INTERVAL = float(os.getenv("PROFILING_INTERVAL", 0.002))
+
+# (kind, detail, start offset, duration) for the request being profiled;
+# None everywhere else, so span() is a single lookup on the normal path
+_spans: ContextVar[Optional[list]] = ContextVar("profile_spans", default=None)
+
+
+def record_span(kind: str, seconds: float, detail: str = ""):
+    spans = _spans.get()
+    if spans is not None:
+        spans.append((kind, detail, time.perf_counter() - seconds, seconds))
+
+
+@contextmanager
+def span(kind: str, detail: str = ""):
+    spans = _spans.get()
+    if spans is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans.append((kind, detail, start, time.perf_counter() - start))
+
+
+def sign(expires: int, secret: str = PROFILING_SECRET) -> str:
+    signature = hmac.new(secret.encode(), str(expires).encode(), hashlib.sha256).hexdigest()
+    return f"{expires}.{signature}"
+
+
+def make_token(ttl: int = 600, secret: str = PROFILING_SECRET) -> str:
+    return sign(int(time.time()) + ttl, secret)
+
+
+def verify_token(token: str, secret: str = PROFILING_SECRET) -> bool:
+    # headers arrive as latin-1, and compare_digest raises on non-ASCII str;
+    # a valid expiry is a plain unix timestamp, never thousands of digits
+    if not secret or not token.isascii():
+        return False
+    expires, _, _ = token.partition(".")
+    if not expires.isdigit() or len(expires) > 12 or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(token.encode(), sign(int(expires), secret).encode())
+
+
+class Sampler(threading.Thread):
+    """
+    Samples the event loop thread's stack every `interval` seconds, keeping
+    only samples taken while this request's coroutine is running (its stack
+    reaches `marker`, the middleware frame). Time spent awaiting shows up as
+    waiting.
+    """
+
+    def __init__(self, thread_id: int, marker, interval: float):
+        super().__init__(name="request-profiler", daemon=True)
+        self.thread_id = thread_id
+        self.marker = marker
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.waiting = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and frame is not self.marker:
+                code = frame.f_code
+                stack.append((code.co_name, code.co_filename, frame.f_lineno))
+                frame = frame.f_back
+            if frame is None:
+                self.waiting += 1
+            else:
+                self.stacks[tuple(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def speedscope(name: str, sampler: Sampler, duration: float) -> dict:
+    frames: List[dict] = []
+    index: Dict[Tuple, int] = {}
+
+    def frame_id(frame: Tuple) -> int:
+        if frame not in index:
+            index[frame] = len(frames)
+            function, file, line = frame
+            frames.append({"name": function, "file": file, "line": line})
+        return index[frame]
+
+    samples, weights = [], []
+    for stack, count in sampler.stacks.items():
+        samples.append([frame_id(frame) for frame in stack])
+        weights.append(count * sampler.interval)
+    if sampler.waiting:
+        samples.append([frame_id(("[awaiting I/O or other requests]", "", 0))])
+        weights.append(sampler.waiting * sampler.interval)
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "exporter": "blog-api",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "seconds",
+            "startValue": 0,
+            "endValue": duration,
+            "samples": samples,
+            "weights": weights,
+        }],
+    }
+
+
+def span_report(spans: list, started: float) -> List[dict]:
+    return [
+        {"kind": kind, "detail": detail, "start_ms": round((start - started) * 1000, 3),
+         "duration_ms": round(seconds * 1000, 3)}
+        for kind, detail, start, seconds in spans
+    ]
+
+
+def server_timing(spans: list, total: float) -> str:
+    totals: Dict[str, List[float]] = defaultdict(lambda: [0.0, 0])
+    for kind, _, _, seconds in spans:
+        totals[kind][0] += seconds
+        totals[kind][1] += 1
+    parts = [f'{kind};desc="{count} calls";dur={seconds * 1000:.2f}' for kind, (seconds, count) in totals.items()]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling requests marked with a signed token. Added by
+    api.main only when PROFILING_ENABLED is set; unmarked requests are
+    passed straight through after a header and query string check.
+    """
+
+    def __init__(self, app, secret: str = PROFILING_SECRET):
+        self.app = app
+        self.secret = secret
+
+    def _marked(self, scope) -> Tuple[Optional[str], str]:
+        token, output = None, PROFILING_OUTPUT
+        for name, value in scope["headers"]:
+            if name == b"x-profile":
+                token = value.decode("latin-1")
+            elif name == b"x-profile-output":
+                output = value.decode("latin-1")
+        query_string = scope.get("query_string", b"")
+        if token is None and b"_profile=" in query_string:
+            params = parse_qs(query_string.decode("latin-1"))
+            token = params.get("_profile", [None])[0]
+            output = params.get("_profile_output", [output])[0]
+        return token, output
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        token, output = self._marked(scope)
+        if token is None or not verify_token(token, self.secret):
+            return await self.app(scope, receive, send)
+
+        profile_id = uuid.uuid4().hex
+        name = f'{scope["method"]} {scope["path"]}'
+        inline = output == "inline"
+        spans: list = []
+        status_code = None
+        spans_token = _spans.set(spans)
+        sampler = Sampler(threading.get_ident(), sys._getframe(), PROFILING_INTERVAL)
+        started = time.perf_counter()
+
+        async def send_profiled(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if inline:
+                    return
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", server_timing(spans, time.perf_counter() - started).encode("latin-1")),
+                    (b"x-profile-id", profile_id.encode("latin-1")),
+                ]
+            elif inline:
+                return
+            await send(message)
+
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_profiled)
+        finally:
+            duration = time.perf_counter() - started
+            sampler.stop()
+            _spans.reset(spans_token)
+
+        profile = speedscope(name, sampler, duration)
+        report = {"id": profile_id, "request": name, "status": status_code,
+                  "duration_ms": round(duration * 1000, 3), "spans": span_report(spans, started)}
+        if inline:
+            body = json.dumps({**report, "speedscope": profile}).encode()
+            await send({"type": "http.response.start", "status": 200, "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"server-timing", server_timing(spans, duration).encode("latin-1")),
+                (b"x-profile-id", profile_id.encode("latin-1")),
+            ]})
+            await send({"type": "http.response.body", "body": body})
+        else:
+            await asyncio.to_thread(self._write, profile_id, profile, report)
+
+    def _write(self, profile_id: str, profile: dict, report: dict):
+        PROFILING_DIR.mkdir(parents=True, exist_ok=True)
+        (PROFILING_DIR / f"{profile_id}.speedscope.json").write_text(json.dumps(profile))
+        (PROFILING_DIR / f"{profile_id}.spans.json").write_text(json.dumps(report))
+
+
+if __name__ == "__main__":
+    print(make_token(int(sys.argv[1]) if len(sys.argv) > 1 else 600))
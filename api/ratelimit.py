@@ -0,0 +1,203 @@
+import math
+import os
+import time
+from typing import Dict, Tuple
+from dotenv import load_dotenv
+from fastapi import HTTPException, Request, status
+from pymongo import ReturnDocument
+from .schemas import db
+from .Oauth2 import verify_access_token
+
+load_dotenv()
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+# "memory" is per worker; "mongo" shares buckets between workers
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+# use the first X-Forwarded-For address as the client IP (only behind a trusted proxy)
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() in ("1", "true", "yes")
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+def parse_rate(rate: str) -> Tuple[int, float]:
+    """
+    Parse "10/minute" into (bucket capacity, tokens refilled per second).
+    """
+    count, _, period = rate.partition("/")
+    return int(count), int(count) / _PERIODS[period.strip().rstrip("s")]
+
+
+class Decision:
+    __slots__ = ("allowed", "remaining", "reset", "retry_after")
+
+    def __init__(self, allowed: bool, remaining: int, reset: float, retry_after: float):
+        self.allowed = allowed
+        self.remaining = remaining
+        self.reset = reset
+        self.retry_after = retry_after
+
+
+def _decide(tokens: float, allowed: bool, capacity: int, refill: float) -> Decision:
+    return Decision(
+        allowed=allowed,
+        remaining=int(tokens),
+        reset=(capacity - tokens) / refill,
+        retry_after=0 if allowed else (1 - tokens) / refill,
+    )
+
+
+class MemoryBuckets:
+    max_keys = 100_000
+
+    def __init__(self):
+        # key -> (tokens, last refill time, capacity, refill rate)
+        self._buckets: Dict[str, Tuple[float, float, int, float]] = {}
+
+    async def take(self, key: str, capacity: int, refill: float) -> Decision:
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        tokens = capacity if bucket is None else min(capacity, bucket[0] + (now - bucket[1]) * refill)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        if bucket is None and len(self._buckets) >= self.max_keys:
+            self._prune(now)
+        self._buckets[key] = (tokens, now, capacity, refill)
+        return _decide(tokens, allowed, capacity, refill)
+
+    def _prune(self, now: float):
+        # buckets that have refilled completely carry no state worth keeping
+        full = [key for key, (tokens, last, capacity, refill) in self._buckets.items()
+                if tokens + (now - last) * refill >= capacity]
+        for key in full:
+            del self._buckets[key]
+
+
+class MongoBuckets:
+    """
+    Buckets in the `rateLimits` collection, refilled and drawn from in one
+    atomic pipeline update so every worker sees the same counts. Idle
+    buckets expire through the TTL index on `expires_at`.
+    """
+
+    async def take(self, key: str, capacity: int, refill: float) -> Decision:
+        now = time.time()
+        ttl_ms = math.ceil(capacity / refill * 1000)
+        bucket = await db["rateLimits"].find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {
+                    "tokens": {"$min": [capacity, {"$add": [
+                        {"$ifNull": ["$tokens", capacity]},
+                        {"$multiply": [{"$max": [0, {"$subtract": [now, {"$ifNull": ["$ts", now]}]}]}, refill]},
+                    ]}]},
+                    "ts": now,
+                }},
+                {"$set": {"allowed": {"$gte": ["$tokens", 1]}}},
+                {"$set": {
+                    "tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", 1]}, "$tokens"]},
+                    "expires_at": {"$add": ["$$NOW", ttl_ms]},
+                }},
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return _decide(bucket["tokens"], bucket["allowed"], capacity, refill)
+
+
+def make_backend(name: str = RATE_LIMIT_BACKEND):
+    if name == "memory":
+        return MemoryBuckets()
+    if name == "mongo":
+        return MongoBuckets()
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {name}")
+
+
+backend = make_backend()
+
+
+def client_ip(request: Request) -> str:
+    if RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+class RateLimit:
+    """
+    Token-bucket limit as a route dependency, e.g.
+
+        @router.post("", dependencies=[Depends(RateLimit("10/minute"))])
+
+    `per` picks the bucket key: "ip" (client address), "user" (the bearer
+    token's user id, falling back to the IP) or "route" (one bucket shared by
+    every caller). Buckets are per method and route unless a `name` is
+    given, so several routes can share one.
+    """
+
+    def __init__(self, rate: str, per: str = "ip", name: str = None):
+        if per not in ("ip", "user", "route"):
+            raise ValueError(f"Unknown rate limit key: {per}")
+        self.rate = rate
+        self.per = per
+        self.name = name
+        self.capacity, self.refill = parse_rate(rate)
+
+    def identity(self, request: Request) -> str:
+        if self.per == "route":
+            return "*"
+        if self.per == "user":
+            scheme, _, token = request.headers.get("authorization", "").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                try:
+                    return "user:" + verify_access_token(token).id
+                except HTTPException:
+                    pass
+        return "ip:" + client_ip(request)
+
+    async def __call__(self, request: Request):
+        if not RATE_LIMIT_ENABLED:
+            return
+        # GET and POST on one path may have different limits; keep them apart
+        name = self.name or f'{request.method} {request.scope["route"].path}'
+        decision = await backend.take(f"{name}|{self.identity(request)}", self.capacity, self.refill)
+        headers = {
+            "RateLimit-Limit": str(self.capacity),
+            "RateLimit-Remaining": str(decision.remaining),
+            "RateLimit-Reset": str(math.ceil(decision.reset)),
+        }
+        if not decision.allowed:
+            headers["Retry-After"] = str(math.ceil(decision.retry_after))
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests",
+                headers=headers,
+            )
+        # routes may return their own Response, so the headers are added by
+        # RateLimitHeadersMiddleware rather than through an injected Response
+        request.scope["rate_limit_headers"] = headers
+
+
+class RateLimitHeadersMiddleware:
+    """
+    Copy the headers left by RateLimit onto successful responses.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                headers = scope.get("rate_limit_headers")
+                if headers:
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()
+                    ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
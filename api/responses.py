@@ -0,0 +1,70 @@
+import json
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Optional, Type
+from bson import ObjectId
+from fastapi.responses import Response
+from pydantic import BaseModel
+from pydantic_core import PydanticUndefined
+from .profiling import span
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional, stdlib json is the fallback
+    orjson = None
+
+
+def _default(obj: Any):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, default=_default, separators=(",", ":")).encode()
+
+
+@lru_cache(maxsize=None)
+def _fields(model: Type[BaseModel]) -> tuple:
+    """
+    (output key, default) for every field of `model`. The default is
+    PydanticUndefined for required fields and for default factories, which
+    are not applied.
+    """
+    return tuple((field.alias or name, field.default) for name, field in model.model_fields.items())
+
+
+def project(model: Type[BaseModel], doc: Optional[dict]) -> Optional[dict]:
+    """
+    Shape a document from one of our own collections like `model` would,
+    without validating it: keep only the model's fields (by alias) and fill
+    in plain defaults. Fields outside the model, such as password hashes,
+    never reach the client.
+    """
+    if doc is None:
+        return None
+    out = {}
+    for key, default in _fields(model):
+        if key in doc:
+            out[key] = doc[key]
+        elif default is not PydanticUndefined:
+            out[key] = default
+    return out
+
+
+class DocumentResponse(Response):
+    """
+    JSON response for trusted database documents. Returning it from a route
+    skips FastAPI's response_model validation and jsonable_encoder pass;
+    the route's response_model still documents the shape in OpenAPI.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        with span("serialize"):
+            return dumps(content)
@@ -1,9 +1,10 @@
 # api/routes/auth.py
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
 from ..schemas import db
-import api.utils as utils
+from ..hashing import hasher
 from ..Oauth2 import create_access_token
+from ..ratelimit import RateLimit
 
 router = APIRouter(
     prefix="/login",
@@ -14,7 +15,7 @@ class LoginRequest(BaseModel):
     username: str
     password: str
 
-@router.post("", status_code=status.HTTP_200_OK)
+@router.post("", status_code=status.HTTP_200_OK, dependencies=[Depends(RateLimit("10/minute"))])
 async def login(credentials: LoginRequest):
     # pick your users collection
     users_col = db["users"]                 # <— here
@@ -22,7 +23,7 @@ async def login(credentials: LoginRequest):
     # now call .find_one on the collection
     user = await db["users"].find_one({"name": credentials.username})
 
-    if not user or not utils.verify_password(credentials.password, user["password"]):
+    if not user or not await hasher.verify(credentials.password, user["password"]):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Invalid username or password"
@@ -0,0 +1,235 @@
+import asyncio
+import logging
+import os
+import zlib
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Literal, Optional, Tuple
+from dotenv import load_dotenv
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+from ..schemas import BlogContent, BlogImportReport, db, TokenData
+from ..Oauth2 import get_current_user
+from ..cache import blog_cache
+from ..pagination import ascending, encode_cursor, keyset_filter
+from ..responses import DocumentResponse, dumps
+from ..search import search_backend
+from .blog_content import bump_post_count, new_post_document
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 500))
+IMPORT_MAX_LINE_BYTES = int(os.getenv("IMPORT_MAX_LINE_BYTES", 1024 * 1024))
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", 1000))
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 500))
+
+# Mounted before the blog_content router so /blog/import and /blog/export
+# are not captured by /blog/{id}.
+router = APIRouter(
+    prefix="/blog",
+    tags=["Blog Content"]
+)
+
+
+async def ndjson_lines(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """
+    Split a byte stream into (line number, line) pairs without holding more
+    than one line in memory. Lines longer than `max_line_bytes` come out as
+    (line number, None).
+    """
+    buffer = b""
+    line_no = 0
+    oversized = False
+    async for chunk in chunks:
+        *lines, buffer = (buffer + chunk).split(b"\n")
+        for line in lines:
+            line_no += 1
+            yield line_no, None if oversized or len(line) > max_line_bytes else line
+            oversized = False
+        if len(buffer) > max_line_bytes:
+            # keep counting the line but stop buffering it
+            buffer = b""
+            oversized = True
+    if buffer or oversized:
+        yield line_no + 1, None if oversized else buffer
+
+
+class ImportJob:
+    def __init__(self, author: dict):
+        self.author = author
+        self.imported = 0
+        self.failed = 0
+        self.errors: List[dict] = []
+        self.errors_truncated = False
+
+    def error(self, line: int, message: str):
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({"line": line, "error": message})
+        else:
+            self.errors_truncated = True
+
+    async def insert(self, batch: List[Tuple[int, dict]]):
+        """
+        Write one batch with a single unordered insert_many; a bad document
+        only fails its own line.
+        """
+        failed = set()
+        try:
+            await db["blogPost"].insert_many([doc for _, doc in batch], ordered=False)
+        except BulkWriteError as e:
+            for write_error in e.details.get("writeErrors", []):
+                index = write_error["index"]
+                failed.add(index)
+                self.error(batch[index][0], write_error.get("errmsg", "write failed"))
+        for index, (_, doc) in enumerate(batch):
+            if index not in failed:
+                self.imported += 1
+                await search_backend.index_post(doc)
+        if len(batch) > len(failed):
+            await bump_post_count(str(self.author["_id"]), len(batch) - len(failed))
+
+    def report(self) -> dict:
+        return {
+            "imported": self.imported,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.errors_truncated,
+        }
+
+
+@router.post("/import", response_description="Bulk import posts from NDJSON", response_model=BlogImportReport)
+async def import_blog_posts(
+    request: Request,
+    batch_size: int = Query(IMPORT_BATCH_SIZE, ge=1, le=10000),
+    current_user: TokenData = Depends(get_current_user),
+):
+    """
+    Import one post per line (`{"title": ..., "body": ...}`) as the current
+    user. The body is read as it arrives and written in unordered batches;
+    at most one batch insert runs while the next batch is being parsed, so
+    memory stays flat and slow inserts push back on the upload.
+    """
+    author = await db["users"].find_one({"_id": current_user.id})
+    if not author:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Author not found",
+        )
+
+    job = ImportJob(author)
+    batch: List[Tuple[int, dict]] = []
+    pending: Optional[asyncio.Task] = None
+    try:
+        async for line_no, line in ndjson_lines(request.stream(), IMPORT_MAX_LINE_BYTES):
+            if line is None:
+                job.error(line_no, f"Line longer than {IMPORT_MAX_LINE_BYTES} bytes")
+                continue
+            if not line.strip():
+                continue
+            try:
+                post = BlogContent.model_validate_json(line)
+            except ValidationError as e:
+                job.error(line_no, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+                continue
+            batch.append((line_no, new_post_document(post, author)))
+            if len(batch) >= batch_size:
+                if pending is not None:
+                    await pending
+                pending = asyncio.create_task(job.insert(batch))
+                batch = []
+        if pending is not None:
+            await pending
+            pending = None
+        if batch:
+            await job.insert(batch)
+    except Exception:
+        if pending is not None:
+            pending.cancel()
+        logger.exception("Bulk import failed after %d posts", job.imported)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error",
+        )
+    finally:
+        if job.imported:
+            await blog_cache.invalidate(prefix="posts:")
+
+    logger.info("Imported %d posts, %d failed", job.imported, job.failed,
+                extra={"author_id": str(author["_id"])})
+    return DocumentResponse(job.report())
+
+
+def _utc_iso(value: datetime) -> str:
+    # created_at is stored as an ISO string in UTC, so compare in the same form
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat()
+
+
+@router.get("/export", response_description="Stream posts as NDJSON")
+async def export_blog_posts(
+    format: Literal["ndjson", "gzip"] = "ndjson",
+    author_id: Optional[str] = None,
+    since: Optional[datetime] = Query(None, description="Only posts created at or after this time"),
+    until: Optional[datetime] = Query(None, description="Only posts created before this time"),
+    cursor: Optional[str] = Query(None, description="Resume after the last `_cursor` line received"),
+    batch_size: int = Query(EXPORT_BATCH_SIZE, ge=1, le=10000),
+    current_user: TokenData = Depends(get_current_user),
+):
+    """
+    Stream every matching post, oldest first, one JSON document per line.
+    After every `batch_size` posts, and at the end, a `{"_cursor": ...}`
+    line records the position; pass it back as `cursor` to resume an
+    interrupted export.
+    """
+    query = {}
+    if author_id is not None:
+        query["author_id"] = author_id
+    created_at = {}
+    if since is not None:
+        created_at["$gte"] = _utc_iso(since)
+    if until is not None:
+        created_at["$lt"] = _utc_iso(until)
+    if created_at:
+        query["created_at"] = created_at
+    query = keyset_filter("created_at", cursor, query, direction=1)
+
+    async def lines():
+        chunk = []
+        last = None
+        posts = db["blogPost"].find(query).sort(ascending("created_at")).batch_size(batch_size)
+        async for post in posts:
+            chunk.append(dumps(post))
+            last = post
+            if len(chunk) >= batch_size:
+                chunk.append(dumps({"_cursor": encode_cursor("created_at", last["created_at"], last["_id"])}))
+                yield b"\n".join(chunk) + b"\n"
+                chunk = []
+        if last is not None:
+            chunk.append(dumps({"_cursor": encode_cursor("created_at", last["created_at"], last["_id"])}))
+        if chunk:
+            yield b"\n".join(chunk) + b"\n"
+
+    async def gzipped():
+        compressor = zlib.compressobj(wbits=31)  # gzip container
+        async for data in lines():
+            compressed = compressor.compress(data)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+
+    if format == "gzip":
+        return StreamingResponse(
+            gzipped(),
+            media_type="application/gzip",
+            headers={"Content-Disposition": 'attachment; filename="posts.ndjson.gz"'},
+        )
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="posts.ndjson"'},
+    )
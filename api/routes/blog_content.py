@@ -1,40 +1,300 @@
+import logging
+import os
 from datetime import datetime, timezone
-from typing import List
+from typing import Literal, Optional
 from bson import ObjectId
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
-from ..schemas import BlogContent, BlogContentResponse, db, TokenData
+from pymongo import ReturnDocument
+from ..schemas import BlogAuthorPage, BlogBatch, BlogContent, BlogContentPage, BlogContentResponse, BlogSearchPage, db, TokenData
+from ..utils import summarize
+from ..pagination import MAX_PAGE_SIZE, SortField, descending, keyset_filter, page
 from ..Oauth2 import get_current_user
+from ..cache import blog_cache
+from ..responses import DocumentResponse, project
+from ..search import search_backend
+from ..changes import DELETE, RESET, ChangeEvent, change_bus
+from ..loader import post_loader, user_loader
+from ..conditional import (
+    CACHE_CONTROL, VALIDATOR_PROJECTION, is_conditional, last_modified, not_modified, not_modified_response,
+    page_etag, post_etag, validators,
+)
+
+logger = logging.getLogger(__name__)
+
+BLOG_BATCH_MAX_IDS = int(os.getenv("BLOG_BATCH_MAX_IDS", 1000))
 
 router=APIRouter(
     prefix="/blog",
     tags=["Blog Content"]
 )
 
-@router.get("/", response_description="Get Blog Posts", response_model= List[BlogContentResponse])
-async def get_blog_posts(limit: int = 4, orderby: str = "created_at"):
+# fields a client may pick with `fields=`; _id is always returned
+PROJECTABLE_FIELDS = ("title", "body", "excerpt", "word_count", "author_name", "author_id", "created_at")
+# excerpt and word_count are stored on every post (api.migrations backfills older ones)
+SUMMARY_FIELDS = ("_id", "title", "excerpt", "word_count", "author_name", "author_id", "created_at")
+
+
+def new_post_document(blog_content: BlogContent, author: dict) -> dict:
+    """
+    Turn a validated post into the document stored in blogPost, with author
+    info, timestamp and the precomputed summary fields.
+    """
+    data = jsonable_encoder(blog_content)
+    data["author_name"] = author["name"]
+    data["author_id"] = str(author["_id"])
+    data["created_at"] = data["updated_at"] = datetime.now(timezone.utc).isoformat()
+    data["version"] = 1
+    data.update(summarize(data["body"]))
+    return data
+
+
+def list_projection(view: str, fields: Optional[str], orderby: str):
+    """
+    Return (Mongo projection, keys to return) for a list request, or
+    (None, None) for full posts.
+    """
+    if fields:
+        wanted = tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+        unknown = [f for f in wanted if f not in PROJECTABLE_FIELDS]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown fields: {', '.join(unknown)}"
+            )
+        keys = ("_id",) + wanted
+    elif view == "summary":
+        keys = SUMMARY_FIELDS
+    else:
+        return None, None
+    projection = {key: 1 for key in keys if key != "_id"}
+    # the sort field is needed to build the next cursor, the rest for the validators
+    for key in (orderby, *VALIDATOR_PROJECTION):
+        projection.setdefault(key, 1)
+    return projection, keys
+
+
+async def not_found_or_forbidden(id: str) -> HTTPException:
+    """
+    Explain why a write filtered on (_id, author_id) matched nothing: the
+    post does not exist, or it belongs to someone else.
+    """
+    if await db["blogPost"].find_one({"_id": id}, {"_id": 1}) is None:
+        return HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Blog Post {id} not found"
+        )
+    return HTTPException(
+        status_code=status.HTTP_403_FORBIDDEN,
+        detail="You are not the owner of this blog post"
+    )
+
+async def bump_post_count(author_id: str, amount: int):
+    """
+    Keep users.post_count in step with a create, delete or import. Users
+    without the field yet are left alone until api.migrations counts them,
+    so a $inc never turns a missing count into a wrong one.
+    """
+    await db["users"].update_one(
+        {"_id": author_id, "post_count": {"$exists": True}},
+        {"$inc": {"post_count": amount}},
+    )
+
+
+async def author_post_count(author: dict) -> int:
+    """
+    The author's stored post_count. Authors the migrations have not reached
+    yet, e.g. registered by an older worker during a deploy, are counted
+    without storing the result.
+    """
+    if "post_count" in author:
+        return author["post_count"]
+    return await db["blogPost"].count_documents({"author_id": str(author["_id"])})
+
+
+async def post_page(request: Request, query: dict, orderby: str, limit: int, cursor: Optional[str],
+                    projection: Optional[dict], keys: Optional[tuple], cache_key: str, extra=None):
+    """
+    Serve one keyset page of posts matching `query`, through the cache and
+    with validators. `extra` is an optional coroutine function whose dict
+    is merged into the page body.
+    """
+    query = keyset_filter(orderby, cursor, query)
+
+    async def load_page():
+        # fetch one extra post to know whether there is a next page
+        blog_posts = await db["blogPost"].find(query, projection).sort(descending(orderby)).limit(limit + 1).to_list(limit + 1)
+        result = page(blog_posts, orderby, limit)
+        if keys is None:
+            result["items"] = [project(BlogContentResponse, post) for post in result["items"]]
+        else:
+            result["items"] = [{key: post[key] for key in keys if key in post} for post in result["items"]]
+        extra_values = await extra() if extra is not None else None
+        result.update(extra_values or {})
+        modified = last_modified(blog_posts[:limit])
+        return {
+            "body": result,
+            "etag": page_etag(blog_posts, extra_values),
+            "last_modified": modified.isoformat() if modified else None,
+        }
+
     try:
-        blog_posts = await db["blogPost"].find({ "$query": {}, "$orderby": { orderby : -1 } }).to_list(limit)
-        return blog_posts
-    except Exception as e:
-        print(e)
+        if is_conditional(request):
+            # same page, validator fields only
+            stamps = await db["blogPost"].find(query, VALIDATOR_PROJECTION).sort(descending(orderby)).limit(limit + 1).to_list(limit + 1)
+            etag = page_etag(stamps, await extra() if extra is not None else None)
+            if not_modified(request, etag):
+                return not_modified_response(validators(etag, last_modified(stamps[:limit]), "posts"))
+        cached = await blog_cache.get_or_load(cache_key, load_page)
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Failed to list blog posts")
         raise HTTPException(
             status_code=500,
             detail="Internal server error"
         )
+    modified = datetime.fromisoformat(cached["last_modified"]) if cached["last_modified"] else None
+    return DocumentResponse(cached["body"], headers=validators(cached["etag"], modified, "posts"))
+
+
+async def on_post_change(event: ChangeEvent):
+    """
+    Apply a blogPost write seen by the change listener, usually one made
+    by another worker, to this process's cache and search index.
+    """
+    if event.operation == RESET:
+        await blog_cache.invalidate(prefix="post")
+        await search_backend.rebuild(db)
+        return
+    await blog_cache.invalidate(f"post:{event.id}", prefix="posts:")
+    if event.operation == DELETE:
+        await search_backend.remove_post(str(event.id))
+    elif event.document is not None:
+        await search_backend.index_post(event.document)
+
+
+change_bus.subscribe("blogPost", on_post_change)
+
+@router.get("/", response_description="Get Blog Posts", response_model=BlogContentPage)
+async def get_blog_posts(
+    request: Request,
+    limit: int = Query(4, ge=1, le=MAX_PAGE_SIZE),
+    orderby: SortField = "created_at",
+    cursor: Optional[str] = Query(None, description="`next` value from the previous page"),
+    view: Literal["full", "summary"] = Query("full", description="`summary` returns excerpts instead of bodies"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. `title,excerpt`"),
+):
+    projection, keys = list_projection(view, fields, orderby)
+    cache_key = f"posts:{orderby}:{limit}:{cursor}:{','.join(keys or ('full',))}"
+    return await post_page(request, {}, orderby, limit, cursor, projection, keys, cache_key)
+
+@router.get("/author/{author_id}", response_description="Get an author's Blog Posts", response_model=BlogAuthorPage)
+async def get_author_posts(
+    request: Request,
+    author_id: str,
+    limit: int = Query(4, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="`next` value from the previous page"),
+    view: Literal["full", "summary"] = Query("full", description="`summary` returns excerpts instead of bodies"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. `title,excerpt`"),
+):
+    """
+    Newest first, served by the (author_id, created_at, _id) index.
+    """
+    projection, keys = list_projection(view, fields, "created_at")
+
+    async def post_count():
+        author = await db["users"].find_one({"_id": author_id}, {"post_count": 1})
+        if author is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Author not found"
+            )
+        return {"post_count": await author_post_count(author)}
+
+    # under posts: so every post write invalidates it
+    cache_key = f"posts:author:{author_id}:{limit}:{cursor}:{','.join(keys or ('full',))}"
+    return await post_page(request, {"author_id": author_id}, "created_at", limit, cursor,
+                           projection, keys, cache_key, extra=post_count)
     
+@router.get("/search", response_description="Search Blog Posts", response_model=BlogSearchPage)
+async def search_blog_posts(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="`next` value from the previous page"),
+):
+    projection, keys = list_projection("summary", None, "created_at")
+    try:
+        result = await search_backend.search(db, q, limit, cursor, projection)
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Failed to search blog posts")
+        raise HTTPException(
+            status_code=500,
+            detail="Internal server error"
+        )
+    result["items"] = [{key: post[key] for key in keys + ("score",) if key in post} for post in result["items"]]
+    return DocumentResponse(result, headers={"Cache-Control": CACHE_CONTROL["search"]})
+
+@router.get("/batch", response_description="Get Blog Posts by id", response_model=BlogBatch)
+async def get_blog_posts_by_id(
+    ids: str = Query(..., description="Comma-separated post ids; order and repeats are kept"),
+    view: Literal["full", "summary"] = Query("full", description="`summary` returns excerpts instead of bodies"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. `title,excerpt`"),
+):
+    """
+    Resolve many posts with one $in query instead of one request per id.
+    """
+    wanted = [id.strip() for id in ids.split(",") if id.strip()]
+    if len(wanted) > BLOG_BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {BLOG_BATCH_MAX_IDS} ids per request"
+        )
+    projection, keys = list_projection(view, fields, "created_at")
+    try:
+        docs = await db["blogPost"].find({"_id": {"$in": list(dict.fromkeys(wanted))}}, projection).to_list(None)
+    except Exception:
+        logger.exception("Failed to fetch blog posts by id")
+        raise HTTPException(
+            status_code=500,
+            detail="Internal server error"
+        )
+    if keys is None:
+        found = {post["_id"]: project(BlogContentResponse, post) for post in docs}
+    else:
+        found = {post["_id"]: {key: post[key] for key in keys if key in post} for post in docs}
+    return DocumentResponse({"items": [found.get(id) for id in wanted]})
+
 @router.get("/{id}", response_description="Get Blog Post", response_model= BlogContentResponse)
-async def get_blog_post(id: str):
+async def get_blog_post(id: str, request: Request):
     try:
-        blog_post = await db["blogPost"].find_one({"_id": id})
-        return blog_post
-    except Exception as e:
-        print(e)
+        if is_conditional(request):
+            # answer revalidations from the version stamps, without the body
+            stamps = await db["blogPost"].find_one({"_id": id}, VALIDATOR_PROJECTION)
+            if stamps is not None:
+                etag, modified = post_etag(stamps), last_modified([stamps])
+                if not_modified(request, etag, modified):
+                    return not_modified_response(validators(etag, modified, "post"))
+        # cache misses from concurrent requests share one $in query
+        blog_post = await blog_cache.get_or_load(f"post:{id}", lambda: post_loader.load(id))
+    except Exception:
+        logger.exception("Failed to fetch blog post %s", id)
         raise HTTPException(
             status_code=500,
             detail="Internal server error"
         )
+    if blog_post is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Blog Post {id} not found"
+        )
+    return DocumentResponse(
+        project(BlogContentResponse, blog_post),
+        headers=validators(post_etag(blog_post), last_modified([blog_post]), "post"),
+    )
     
 @router.post(
     "/",
@@ -47,108 +307,82 @@ async def create_post(
     current_user: TokenData = Depends(get_current_user),
 ):
     try:
-        # 1) Turn Pydantic model into a dict
-        print("data", blog_content)
-        data = jsonable_encoder(blog_content)
-        print("▶ Incoming blog data:", data)
-
-        user = await db["users"].find_one({"_id": current_user.id})
+        user = await user_loader.load(current_user.id)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Author not found",
             )
-        print("▶ Resolved current_user to DB user:", user)
 
-        # 3) Add author info & timestamp
-        data["author_name"] = user["name"]
-        data["author_id"] = str(user["_id"])
-        data["created_at"] = datetime.now(timezone.utc).isoformat()
-        print("▶ Final payload for insert:", data)
+        data = new_post_document(blog_content, user)
 
-        # 4) Insert and fetch the new blog post
-        result = await db["blogPost"].insert_one(data)
-        new_id= result.inserted_id
-        created = await db["blogPost"].find_one({"_id": new_id})
-        print("▶ Created blog post:", created)
-        return created
+        # the stored document is exactly `data`, so there is nothing to read back
+        await db["blogPost"].insert_one(data)
+        await bump_post_count(data["author_id"], 1)
+        await blog_cache.invalidate(prefix="posts:")
+        await search_backend.index_post(data)
+        logger.debug("Created blog post %s", data["_id"], extra={"author_id": data["author_id"]})
+        return DocumentResponse(project(BlogContentResponse, data), status_code=status.HTTP_201_CREATED)
 
     except HTTPException:
         # re-raise any HTTPExceptions (404, etc.)
         raise
-    except Exception as e:
-        print("✘ Unexpected error in create_post:", e)
+    except Exception:
+        logger.exception("Unexpected error in create_post")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Internal server error",
         )
     
 @router.put("/{id}", response_description="Update a blog Post", response_model=BlogContentResponse)
-async def update_blog_post(id: str, blog_content: BlogContent, current_user = Depends(get_current_user)):
-
-    if blog_post := await db["blogPost"].find_one({"_id": id}):
-        print(blog_post)
-        # check if the owner is the currently logged in user
-        if blog_post["author_id"] == current_user.id:
-            print("owner")
-            try:
-                blog_content = {k: v for k, v in blog_content.dict().items() if v is not None}
-
-                if len(blog_content) >= 1:
-                    update_result = await db["blogPost"].update_one({"_id": id}, {"$set": blog_content})
-
-                    if update_result.modified_count == 1:
-                        if (updated_blog_post := await db["blogPost"].find_one({"_id": id})) is not None:
-                            return updated_blog_post
-
-                if (existing_blog_post := await db["blogPost"].find_one({"_id": id})) is not None:
-                    return existing_blog_post
-
-                raise HTTPException(status_code=404, detail=f"Blog Post {id} not found")
-
-            except Exception as e:
-                print(e)
-                raise HTTPException(
-                    status_code=500,
-                    detail="Internal server error"
-                )
-        else:
-            raise HTTPException(status_code=403, detail=f"You are not the owner of this blog post")
-
-@router.delete("/{id}", response_description="Delete Blog Post")
-async def delete_blog_post(id: str, current_user: TokenData = Depends(get_current_user)):
+async def update_blog_post(id: str, blog_content: BlogContent, current_user: TokenData = Depends(get_current_user)):
+    changes = {k: v for k, v in blog_content.dict(exclude={"id"}).items() if v is not None}
+    if "body" in changes:
+        changes.update(summarize(changes["body"]))
 
-    # 1) Find the document by string _id
-    blog_post = await db["blogPost"].find_one({"_id": id})
-    if not blog_post:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Blog Post {id} not found"
+    try:
+        # ownership is part of the filter, so the check and the write are one atomic step
+        updated_blog_post = await db["blogPost"].find_one_and_update(
+            {"_id": id, "author_id": current_user.id},
+            {
+                "$set": {**changes, "updated_at": datetime.now(timezone.utc).isoformat()},
+                "$inc": {"version": 1},
+            },
+            return_document=ReturnDocument.AFTER,
         )
-
-    # 2) Check that the current user is the author
-    if blog_post.get("author_id") != current_user.id:
+        if updated_blog_post is not None:
+            await blog_cache.invalidate(f"post:{id}", prefix="posts:")
+            await search_backend.index_post(updated_blog_post)
+    except Exception:
+        logger.exception("Failed to update blog post %s", id)
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You are not the owner of this blog post"
+            status_code=500,
+            detail="Internal server error"
         )
 
-    # 3) Attempt the delete
+    if updated_blog_post is None:
+        raise await not_found_or_forbidden(id)
+    return DocumentResponse(project(BlogContentResponse, updated_blog_post))
+
+@router.delete("/{id}", response_description="Delete Blog Post")
+async def delete_blog_post(id: str, current_user: TokenData = Depends(get_current_user)):
     try:
-        delete_result = await db["blogPost"].delete_one({"_id": id})
-    except Exception as e:
-        print("Delete error:", e)
+        # only the author's own post matches, so there is no separate ownership read
+        deleted = await db["blogPost"].find_one_and_delete(
+            {"_id": id, "author_id": current_user.id},
+            projection={"_id": 1},
+        )
+        if deleted is not None:
+            await bump_post_count(current_user.id, -1)
+            await blog_cache.invalidate(f"post:{id}", prefix="posts:")
+            await search_backend.remove_post(id)
+    except Exception:
+        logger.exception("Failed to delete blog post %s", id)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Internal server error"
         )
 
-    # 4) Return 204 if it actually deleted something
-    if delete_result.deleted_count == 1:
-        return JSONResponse(status_code=status.HTTP_204_NO_CONTENT,content=None)
-
-    # 5) If no document was deleted, treat as not found
-    raise HTTPException(
-        status_code=status.HTTP_404_NOT_FOUND,
-        detail=f"Blog Post {id} not found"
-    )
\ No newline at end of file
+    if deleted is None:
+        raise await not_found_or_forbidden(id)
+    return JSONResponse(status_code=status.HTTP_204_NO_CONTENT,content=None)
@@ -1,27 +1,32 @@
+import logging
+from datetime import datetime, timezone
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.encoders import jsonable_encoder
 from ..schemas import db, TokenData, OtpRequest, OtpResponse,OtpVerification
 from ..Oauth2 import get_current_user
 from ..utils import otp_gen
+from ..otp_store import LOCKED, VERIFIED, otp_store
 from ..send_mail import send_verification_otp
+from ..ratelimit import RateLimit
+
+logger = logging.getLogger(__name__)
 
 router= APIRouter(
     prefix='/otp'
     , tags=["OTP Verification"]
 )
 
-@router.get("", response_description="Generate OTP")
+@router.get("", response_description="Generate OTP", dependencies=[Depends(RateLimit("3/minute", per="user"))])
 async def generate_otp(current_user: TokenData = Depends(get_current_user)):
     try:
-        otp_code = otp_gen()
-        otp_doc = {"otp": otp_code, "user_id": current_user.id}
-
-        result = await db["otp"].insert_one(otp_doc)
-
         user = await db["users"].find_one({"_id": current_user.id})
         if not user:
             raise HTTPException(status.HTTP_404_NOT_FOUND, "User not found")
 
+        # replaces any code issued earlier
+        otp_code = otp_gen()
+        await otp_store.issue(current_user.id, otp_code)
+
         await send_verification_otp(
             subject="OTP VERIFICATION",
             email_to=user["email"],
@@ -34,8 +39,8 @@ async def generate_otp(current_user: TokenData = Depends(get_current_user)):
         return {"msg": "OTP has been sent to your email"}
     except HTTPException:
         raise
-    except Exception as e:
-        print("Unexpected error in generate_otp:", repr(e))
+    except Exception:
+        logger.exception("Unexpected error in generate_otp")
         raise HTTPException(
             status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Internal server error"
@@ -43,7 +48,8 @@ async def generate_otp(current_user: TokenData = Depends(get_current_user)):
 
 @router.post(
     "",
-    response_description="Verify OTP and mark user as verified"
+    response_description="Verify OTP and mark user as verified",
+    dependencies=[Depends(RateLimit("10/minute", per="user"))],
 )
 async def verify_otp(
     payload: OtpRequest,
@@ -54,17 +60,15 @@ async def verify_otp(
     otp_code = data["otp"]
     user_id_str = current_user.id
 
-    # DEBUG: print what we're about to query
-    print(f"Looking up OTP record with user_id={user_id_str!r}, otp={otp_code!r}")
-
-    # 1) Find the OTP record
-    otp_record = await db["otp"].find_one({
-    "user_id": user_id_str,
-    "otp": str(otp_code)          # match the stored string
-})
-    print("OTP record found:", otp_record)
+    # 1) Check and consume the OTP in one step
+    outcome = await otp_store.verify(user_id_str, str(otp_code))  # codes are stored as strings
 
-    if not otp_record:
+    if outcome == LOCKED:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many failed attempts, request a new OTP"
+        )
+    if outcome != VERIFIED:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid or expired OTP"
@@ -72,18 +76,14 @@ async def verify_otp(
 
     result = await db["users"].update_one(
         {"_id": current_user.id},
-        {"$set": {"verified": True}}
+        {"$set": {"verified": True, "updated_at": datetime.now(timezone.utc).isoformat()}}
     )
-    print("User update result:", result.raw_result)
 
-    if result.modified_count != 1:
+    if result.matched_count != 1:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to update user verification status"
         )
-
-    # 3) Clean up OTPs
-    delete_count = (await db["otp"].delete_many({"user_id": user_id_str})).deleted_count
-    print(f"Deleted {delete_count} OTP records for user")
+    logger.debug("Verified user %s", user_id_str)
 
     return {"msg": "User successfully verified"}
\ No newline at end of file
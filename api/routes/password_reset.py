@@ -1,12 +1,19 @@
 # library imports
+import logging
+from datetime import datetime, timezone
 from bson import ObjectId
-from fastapi import APIRouter, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from pymongo import ReturnDocument
 
 # module imports
-from ..schemas import PasswordReset, PasswordResetRequest, db, TokenData
+from ..schemas import PasswordReset, PasswordResetRequest, db, TokenData, UserResponse
 from ..send_mail import password_reset
 from ..Oauth2 import create_access_token, get_current_user, verify_access_token
-from ..utils import get_password_hash
+from ..hashing import hasher
+from ..ratelimit import RateLimit
+from ..responses import DocumentResponse, project
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/password",
@@ -14,11 +21,11 @@ router = APIRouter(
 )
 
 
-@router.post("/request/", response_description="Password reset request")
+@router.post("/request/", response_description="Password reset request", dependencies=[Depends(RateLimit("3/minute"))])
 async def reset_request(user_email: PasswordResetRequest):
     user = await db["users"].find_one({"email": user_email.email})
 
-    print(user)
+    logger.debug("Password reset requested", extra={"user_found": user is not None})
 
     if user is not None:
         token = create_access_token({"id": user["_id"]})
@@ -41,7 +48,7 @@ async def reset_request(user_email: PasswordResetRequest):
         )
 
 
-@router.put("/reset", response_description="Password reset")
+@router.put("/reset", response_description="Password reset", response_model=UserResponse)
 async def reset(
     new_password: PasswordReset,
     token: str = Query(..., description="Your password-reset JWT")
@@ -56,15 +63,16 @@ async def reset(
     if "password" not in data:
         raise HTTPException(400, "No new password provided")
 
-    data["password"] = get_password_hash(data["password"])
+    data["password"] = await hasher.hash(data["password"])
     
-    update_result = await db["users"].update_one(
+    user = await db["users"].find_one_and_update(
         {"_id": token_data.id},
-        {"$set": {"password": data["password"]}}
+        {"$set": {"password": data["password"], "updated_at": datetime.now(timezone.utc).isoformat()}},
+        projection={"password": 0},
+        return_document=ReturnDocument.AFTER,
     )
-    user = await db['users'].find_one({"_id":token_data.id})
 
     if user:
-        return user
+        return DocumentResponse(project(UserResponse, user))
 
     raise HTTPException(404, "User not found")
@@ -1,37 +1,44 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from ..schemas import User,db, UserResponse,TokenData
 from fastapi.encoders import jsonable_encoder
-from ..utils import get_password_hash
+from ..hashing import hasher
 import secrets
+from datetime import datetime, timezone
 from ..send_mail import send_registration_mail
 from ..Oauth2 import get_current_user
+from ..responses import DocumentResponse, project
+from ..ratelimit import RateLimit
+from ..loader import user_loader
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 
 router = APIRouter(
     tags=["User Routes"],
 )
 
-@router.post("/registration", response_description="User registration", response_model=UserResponse)
+@router.post(
+    "/registration",
+    response_description="User registration",
+    response_model=UserResponse,
+    dependencies=[Depends(RateLimit("5/minute"))],
+)
 async def registration(user: User):
     user = jsonable_encoder(user)
-    
-
-    username_found = await db["users"].find_one({"name": user["name"]})
-    email_found = await db["users"].find_one({"email":user["email"]})
-
-    if username_found:
-        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
-                            detail="Username already exists")
-    
-    if email_found:
+    user["password"] = await hasher.hash(user["password"])
+    user['apiKey'] = secrets.token_hex(30)
+    user["created_at"] = user["updated_at"] = datetime.now(timezone.utc).isoformat()
+    user["post_count"] = 0
+
+    # the unique indexes on name and email do the duplicate check
+    try:
+        await db['users'].insert_one(user)
+    except DuplicateKeyError as e:
+        key_pattern = (e.details or {}).get("keyPattern", {})
+        if "name" in key_pattern or "name_unique" in str(e):
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                                detail="Username already exists")
         raise HTTPException(status_code=status.HTTP_409_CONFLICT,
                             detail="Email already exists")
-    
-    user["password"] = get_password_hash(user["password"])
-    user['apiKey'] = secrets.token_hex(30)
-
-    new_user = await db['users'].insert_one(user)
-    created_user = await db['users'].find_one({"_id": new_user.inserted_id})
 
     #send mail
     await send_registration_mail("Regisreation Successful", user["email"],{
@@ -40,16 +47,14 @@ async def registration(user: User):
     })
 
 
-    return created_user
+    return DocumentResponse(project(UserResponse, user))
 
 @router.get("/details", response_model=UserResponse)
 async def details(current_user: TokenData = Depends(get_current_user)):
-    # current_user.id is a string; convert if your DB uses ObjectId
-    user = await db["users"].find_one({"_id": current_user.id})
+    user = await user_loader.load(current_user.id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
-    user = jsonable_encoder(user)
-    return user
\ No newline at end of file
+    return DocumentResponse(project(UserResponse, user))
\ No newline at end of file
@@ -1,18 +1,13 @@
-import os
-from typing import Optional
+from typing import List, Optional, Union
 from dotenv import load_dotenv
 from bson import ObjectId
 from pydantic import BaseModel, Field, EmailStr
 from pydantic_core import core_schema
-import motor.motor_asyncio
+from .database import db
 
 # Load environment variables
 load_dotenv()
 
-# Initialize MongoDB client and select database
-client = motor.motor_asyncio.AsyncIOMotorClient(os.getenv("MONGO_URI"))
-db = client.blog_api
-
 class PyObjectId(ObjectId):
     @classmethod
     def __get_pydantic_core_schema__(cls, source, handler) -> core_schema.CoreSchema:
@@ -123,6 +118,66 @@ class BlogContentResponse(BaseModel):
         }
 
 
+class BlogContentSummary(BaseModel):
+    id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
+    title: str = Field(...)
+    excerpt: str = Field(..., description="Start of the body, cut at a word boundary")
+    word_count: int = Field(...)
+    author_name: str = Field(...)
+    author_id: str = Field(...)
+    created_at: str = Field(...)
+
+    class Config:
+        arbitrary_types_allowed = True
+        json_encoders = {ObjectId: str}
+        schema_extra = {
+            "example": {
+                "title": "blog title",
+                "excerpt": "the first couple of sentences of the blog…",
+                "word_count": 812,
+                "author_name": "name of the author",
+                "author_id": "ID of the author",
+                "created_at": "Date of blog creation"
+            }
+        }
+
+
+class BlogSearchResult(BlogContentSummary):
+    score: float = Field(..., description="Relevance, higher is better")
+
+
+class BlogSearchPage(BaseModel):
+    items: List[BlogSearchResult] = Field(...)
+    next: Optional[str] = Field(default=None, description="Cursor for the next page, absent on the last page")
+
+
+class BlogContentPage(BaseModel):
+    items: List[Union[BlogContentResponse, BlogContentSummary]] = Field(...)
+    next: Optional[str] = Field(default=None, description="Cursor for the next page, absent on the last page")
+
+
+class BlogAuthorPage(BlogContentPage):
+    post_count: int = Field(..., description="Number of posts by the author")
+
+
+class BlogBatch(BaseModel):
+    items: List[Optional[Union[BlogContentResponse, BlogContentSummary]]] = Field(
+        ..., description="One entry per requested id, in request order; null where no post exists"
+    )
+
+
+class BlogImportError(BaseModel):
+    line: int = Field(..., description="1-based line number in the uploaded NDJSON")
+    error: str = Field(...)
+
+
+class BlogImportReport(BaseModel):
+    imported: int = Field(...)
+    failed: int = Field(...)
+    errors: List[BlogImportError] = Field(default_factory=list)
+    errors_truncated: bool = Field(default=False, description="True when more errors occurred than are listed")
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -0,0 +1,191 @@
+import heapq
+import logging
+import math
+import os
+import re
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from .pagination import decode_cursor, encode_cursor
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# "mongo" uses the text index on blogPost; "memory" keeps an inverted index in
+# the process, for deployments without text indexes
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "mongo")
+# relevance weight of a title match compared with a body match
+TITLE_WEIGHT = 3
+
+_TOKEN = re.compile(r"\w+")
+STOPWORDS = frozenset((
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is",
+    "it", "of", "on", "or", "that", "the", "this", "to", "was", "with",
+))
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN.findall(text.lower()) if len(t) > 1 and t not in STOPWORDS]
+
+
+# relevance scores are numbers; anything else cannot be compared with them
+SCORE_TYPES = (int, float)
+
+
+def _page(ranked: List[dict], limit: int) -> dict:
+    items = ranked[:limit]
+    next = None
+    if len(ranked) > limit:
+        next = encode_cursor("score", items[-1]["score"], items[-1]["_id"])
+    return {"items": items, "next": next}
+
+
+class MongoTextSearch:
+    """
+    Search through the `title_body_text` index, ranked by textScore.
+    """
+
+    async def start(self, db):
+        pass
+
+    async def rebuild(self, db):
+        pass
+
+    async def index_post(self, post: dict):
+        pass
+
+    async def remove_post(self, id: str):
+        pass
+
+    async def search(self, db, q: str, limit: int, cursor: Optional[str], projection: dict) -> dict:
+        pipeline = [
+            {"$match": {"$text": {"$search": q}}},
+            {"$addFields": {"score": {"$meta": "textScore"}}},
+        ]
+        if cursor is not None:
+            score, id = decode_cursor(cursor, "score", SCORE_TYPES)
+            pipeline.append({"$match": {"$or": [
+                {"score": {"$lt": score}},
+                {"score": score, "_id": {"$lt": id}},
+            ]}})
+        pipeline += [
+            {"$sort": {"score": -1, "_id": -1}},
+            {"$limit": limit + 1},
+            {"$project": {**projection, "score": 1}},
+        ]
+        ranked = await db["blogPost"].aggregate(pipeline).to_list(limit + 1)
+        return _page(ranked, limit)
+
+
+class InvertedIndexSearch:
+    """
+    In-process inverted index over post titles and bodies, ranked with BM25.
+    Built from the collection at startup and kept in sync by the write routes
+    and, for writes made by other workers, by change events.
+    """
+
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, batch_size: int = 1000):
+        self.batch_size = batch_size
+        # term -> {post id: weighted term frequency}
+        self.postings: Dict[str, Dict[str, float]] = defaultdict(dict)
+        # post id -> (weighted length, terms)
+        self.docs: Dict[str, Tuple[float, Tuple[str, ...]]] = {}
+        self.total_length = 0.0
+
+    async def start(self, db):
+        count = 0
+        async for post in db["blogPost"].find({}, {"title": 1, "body": 1}).batch_size(self.batch_size):
+            await self.index_post(post)
+            count += 1
+        logger.info("Built in-memory search index over %d posts", count)
+
+    async def rebuild(self, db):
+        # build aside and swap, so searches keep working meanwhile
+        fresh = InvertedIndexSearch(self.batch_size)
+        await fresh.start(db)
+        self.postings, self.docs, self.total_length = fresh.postings, fresh.docs, fresh.total_length
+
+    async def index_post(self, post: dict):
+        self.add(str(post["_id"]), post.get("title", ""), post.get("body", ""))
+
+    async def remove_post(self, id: str):
+        self.remove(id)
+
+    def add(self, id: str, title: str, body: str):
+        self.remove(id)
+        frequencies: Dict[str, float] = defaultdict(float)
+        for term in tokenize(title):
+            frequencies[term] += TITLE_WEIGHT
+        for term in tokenize(body):
+            frequencies[term] += 1
+        for term, tf in frequencies.items():
+            self.postings[term][id] = tf
+        length = sum(frequencies.values())
+        self.docs[id] = (length, tuple(frequencies))
+        self.total_length += length
+
+    def remove(self, id: str):
+        doc = self.docs.pop(id, None)
+        if doc is None:
+            return
+        length, terms = doc
+        self.total_length -= length
+        for term in terms:
+            postings = self.postings[term]
+            postings.pop(id, None)
+            if not postings:
+                del self.postings[term]
+
+    def rank(self, q: str, limit: int, after: Optional[Tuple[float, str]] = None) -> List[Tuple[float, str]]:
+        """
+        Top `limit` (score, id) pairs, best first, strictly after `after`.
+        """
+        if not self.docs:
+            return []
+        n = len(self.docs)
+        average = self.total_length / n or 1.0
+        scores: Dict[str, float] = defaultdict(float)
+        for term in set(tokenize(q)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for id, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.docs[id][0] / average)
+                scores[id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        candidates = ((score, id) for id, score in scores.items())
+        if after is not None:
+            candidates = (c for c in candidates if c < after)
+        return heapq.nlargest(limit, candidates)
+
+    async def search(self, db, q: str, limit: int, cursor: Optional[str], projection: dict) -> dict:
+        after = None
+        if cursor is not None:
+            score, id = decode_cursor(cursor, "score", SCORE_TYPES)
+            after = (score, id)
+        ranked = self.rank(q, limit + 1, after)
+        ids = [id for _, id in ranked]
+        posts = {post["_id"]: post async for post in db["blogPost"].find({"_id": {"$in": ids}}, projection)}
+        items = []
+        for score, id in ranked:
+            post = posts.get(id)
+            if post is not None:
+                post["score"] = score
+                items.append(post)
+        return _page(items, limit)
+
+
+def make_search_backend(name: str = SEARCH_BACKEND):
+    if name == "mongo":
+        return MongoTextSearch()
+    if name == "memory":
+        return InvertedIndexSearch()
+    raise ValueError(f"Unknown SEARCH_BACKEND: {name}")
+
+
+search_backend = make_search_backend()
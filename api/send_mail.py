@@ -1,9 +1,24 @@
+import logging
 import os
+from email.message import EmailMessage
+from email.utils import formataddr
+from pathlib import Path
+from typing import AsyncIterable, Optional
 from dotenv import load_dotenv
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig
+from .mail_queue import MailQueue, SmtpSettings
+from .mail_templates import MailTemplates
+from .profiling import span
+from .schemas import db
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes")
+
+
 class Envs:
     MAIL_USERNAME = os.getenv("MAIL_USERNAME")
     MAIL_PASSWORD = os.getenv("MAIL_PASSWORD")
@@ -11,50 +26,99 @@ class Envs:
     MAIL_PORT = int(os.getenv("MAIL_PORT", 587))
     MAIL_SERVER = os.getenv("MAIL_SERVER", "smtp.gmail.com")
     MAIL_FROM_NAME = os.getenv("MAIL_FROM_NAME", "Blog API")
+    MAIL_STARTTLS = _env_flag("MAIL_STARTTLS", True)
+    MAIL_SSL_TLS = _env_flag("MAIL_SSL_TLS", False)
+    MAIL_USE_CREDENTIALS = _env_flag("MAIL_USE_CREDENTIALS", True)
+    MAIL_VALIDATE_CERTS = _env_flag("MAIL_VALIDATE_CERTS", True)
+    # skip the SMTP conversation entirely, for local runs and benchmarks
+    MAIL_SUPPRESS_SEND = _env_flag("MAIL_SUPPRESS_SEND", False)
+    MAIL_QUEUE_SIZE = int(os.getenv("MAIL_QUEUE_SIZE", 1000))
+    MAIL_WORKERS = int(os.getenv("MAIL_WORKERS", 2))
+    MAIL_BATCH_SIZE = int(os.getenv("MAIL_BATCH_SIZE", 20))
+    MAIL_MAX_RETRIES = int(os.getenv("MAIL_MAX_RETRIES", 3))
+    MAIL_RETRY_BACKOFF = float(os.getenv("MAIL_RETRY_BACKOFF", 1.0))
+
 
-conf = ConnectionConfig(
-    MAIL_USERNAME=os.getenv("MAIL_USERNAME"),
-    MAIL_PASSWORD=os.getenv("MAIL_PASSWORD"),
-    MAIL_FROM=os.getenv("MAIL_FROM"),
-    MAIL_PORT=int(os.getenv("MAIL_PORT", 587)),
-    MAIL_SERVER=os.getenv("MAIL_SERVER", "smtp.gmail.com"),
-    MAIL_STARTTLS=True,
-    MAIL_SSL_TLS=False,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=True,
-    TEMPLATE_FOLDER="api/templates"
+# Point MAIL_SERVER/MAIL_PORT at a local aiosmtpd with MAIL_STARTTLS=false and
+# MAIL_USE_CREDENTIALS=false to exercise the whole pipeline without Gmail.
+mail_queue = MailQueue(
+    SmtpSettings(
+        hostname=Envs.MAIL_SERVER,
+        port=Envs.MAIL_PORT,
+        username=Envs.MAIL_USERNAME if Envs.MAIL_USE_CREDENTIALS else None,
+        password=Envs.MAIL_PASSWORD if Envs.MAIL_USE_CREDENTIALS else None,
+        start_tls=Envs.MAIL_STARTTLS,
+        use_tls=Envs.MAIL_SSL_TLS,
+        validate_certs=Envs.MAIL_VALIDATE_CERTS,
+    ),
+    sender=Envs.MAIL_FROM,
+    maxsize=Envs.MAIL_QUEUE_SIZE,
+    workers=Envs.MAIL_WORKERS,
+    batch_size=Envs.MAIL_BATCH_SIZE,
+    max_retries=Envs.MAIL_MAX_RETRIES,
+    backoff=Envs.MAIL_RETRY_BACKOFF,
+    suppress_send=Envs.MAIL_SUPPRESS_SEND,
 )
 
-async def send_registration_mail(subject: str,email_to:str, body:dict):
-    message = MessageSchema(
-        subject=subject,
-        recipients=[email_to],
-        template_body=body,
-        subtype="html"
-        
-    )
+# compiled by the app lifespan (mail_templates.load()), or on first use
+mail_templates = MailTemplates(Path(__file__).parent / "templates")
+
+
+def _message(subject: str, email_to: str, html: str) -> EmailMessage:
+    message = EmailMessage()
+    message["Subject"] = subject
+    message["From"] = formataddr((Envs.MAIL_FROM_NAME, Envs.MAIL_FROM))
+    message["To"] = email_to
+    message.set_content(html, subtype="html")
+    return message
+
 
-    fm = FastMail(conf)
-    await fm.send_message(message=message, template_name="registration.html")
+def build_message(subject: str, email_to: str, template_name: str, body: dict) -> EmailMessage:
+    with span("template", template_name):
+        html = mail_templates.render(template_name, body)
+    return _message(subject, email_to, html)
+
+
+async def send_batch(subject: str, template_name: str, body: dict, recipients: AsyncIterable[dict]) -> int:
+    """
+    Send one template to many recipients (dicts with "name" and "email").
+    `body` is folded into the template once; each recipient only fills in
+    its own name. Messages go through the mail queue with backpressure, so
+    a long recipient stream is consumed at the delivery rate. Returns the
+    number of messages queued.
+    """
+    template = mail_templates.get(template_name).bind({k: v for k, v in body.items() if k != "name"})
+    queued = 0
+    async for recipient in recipients:
+        html = template.render({"name": recipient.get("name", "")})
+        await mail_queue.put(_message(subject, recipient["email"], html))
+        queued += 1
+    return queued
+
+
+async def send_announcement(subject: str, body: dict, query: Optional[dict] = None,
+                            template_name: str = "announcement.html") -> int:
+    """
+    Mail every user matching `query` (all users by default), streaming them
+    from the users cursor rather than loading the collection.
+    """
+    users = db["users"].find(query or {}, {"name": 1, "email": 1}).batch_size(Envs.MAIL_QUEUE_SIZE)
+    queued = await send_batch(subject, template_name, body, users)
+    logger.info("Queued announcement %r for %d users", subject, queued)
+    return queued
+
+
+def enqueue(message: EmailMessage):
+    # SMTP itself runs later on the queue workers, outside the request
+    with span("mail", "enqueue"):
+        mail_queue.enqueue(message)
+
+
+async def send_registration_mail(subject: str,email_to:str, body:dict):
+    enqueue(build_message(subject, email_to, "registration.html", body))
 
 async def password_reset(subject: str, email_to: str, body: dict):
-    message = MessageSchema(
-        subject=subject,
-        recipients=[email_to],
-        template_body=body,
-        subtype='html',
-    )
-    
-    fm = FastMail(conf)
-    await fm.send_message(message, template_name='password_reset.html')
+    enqueue(build_message(subject, email_to, "password_reset.html", body))
 
 async def send_verification_otp(subject: str, email_to: str, body: dict):
-    message = MessageSchema(
-        subject=subject,
-        recipients=[email_to],
-        template_body=body,
-        subtype="html",
-    )
-
-    fm = FastMail(conf)
-    await fm.send_message(message=message, template_name="otp_verification.html")
\ No newline at end of file
+    enqueue(build_message(subject, email_to, "otp_verification.html", body))
@@ -8,6 +8,18 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+EXCERPT_LENGTH = 200
+
+def summarize(body: str) -> dict:
+    """
+    Excerpt and word count stored next to the body, so list pages in
+    summary view never have to load it.
+    """
+    excerpt = body
+    if len(body) > EXCERPT_LENGTH:
+        excerpt = body[:EXCERPT_LENGTH].rsplit(" ", 1)[0].rstrip() + "…"
+    return {"excerpt": excerpt, "word_count": len(body.split())}
+
 def otp_gen():
-    import random
-    return str(random.randint(100000, 999999)) 
+    import secrets
+    return str(secrets.randbelow(900000) + 100000) 
@@ -0,0 +1,50 @@
+"""
+Compare the per-request cost of the get_current_user dependency: a fresh
+decode with each JWT backend versus a hit in the verified-token cache.
+
+    python benchmarks/auth_dependency.py --iterations 20000
+
+Needs the api package importable (run from the repository root). PyJWT is
+only benchmarked when installed.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+
+from api import Oauth2  # noqa: E402
+
+
+async def run(label, iterations, header, clear_cache):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        if clear_cache:
+            Oauth2._verified_tokens.clear()
+        await Oauth2.get_current_user(header)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<24} {elapsed / iterations * 1e6:8.2f} us/request")
+
+
+async def main(args):
+    header = "Bearer " + Oauth2.create_access_token({"id": "0123456789abcdef01234567"})
+    backends = ["jose"]
+    try:
+        import jwt  # noqa: F401
+        backends.append("pyjwt")
+    except ImportError:
+        print("PyJWT not installed, skipping the pyjwt backend")
+
+    for name in backends:
+        Oauth2.jwt_decode, Oauth2.JWTDecodeError = Oauth2.load_jwt_backend(name)
+        await run(f"{name} decode", args.iterations, header, clear_cache=True)
+    await run("verified-token cache", args.iterations, header, clear_cache=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=20000)
+    asyncio.run(main(parser.parse_args()))
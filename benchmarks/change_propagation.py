@@ -0,0 +1,73 @@
+"""
+Measure how long a write takes to reach ChangeListener subscribers, with
+change streams or with the polling fallback. Writes go to a throwaway
+database (blog_changes_bench).
+
+Against a local single-node replica set:
+
+    mongod --replSet rs0 --dbpath /tmp/rs0
+    mongosh --eval 'rs.initiate()'
+    python benchmarks/change_propagation.py --mongo-uri "mongodb://localhost:27017/?replicaSet=rs0"
+
+Add --mode poll to time the fallback used on a standalone mongod.
+Run from the repository root.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+async def main(args):
+    os.environ["MONGO_URI"] = args.mongo_uri
+    os.environ["MONGO_DB_NAME"] = "blog_changes_bench"
+    os.environ["MONGO_MIN_POOL_SIZE"] = "1"
+    from api import changes
+    from api.database import database
+
+    await database.connect()
+    posts = database.db["blogPost"]
+    await posts.delete_many({})
+
+    pending = {}
+    latencies = []
+
+    async def subscriber(event):
+        started = pending.pop(event.id, None)
+        if started is not None:
+            latencies.append(time.perf_counter() - started[0])
+            started[1].set()
+
+    bus = changes.EventBus()
+    bus.subscribe("blogPost", subscriber)
+    listener = changes.ChangeListener(bus, ["blogPost"], mode=args.mode, name="bench")
+    await listener.start()
+    await asyncio.sleep(1 if args.mode != "poll" else changes.CHANGE_POLL_INTERVAL + 0.5)
+
+    for i in range(args.writes):
+        now = datetime.now(timezone.utc).isoformat()
+        seen = asyncio.Event()
+        pending[str(i)] = (time.perf_counter(), seen)
+        await posts.insert_one({"_id": str(i), "title": "t", "created_at": now, "updated_at": now})
+        await asyncio.wait_for(seen.wait(), timeout=30)
+
+    await listener.stop()
+    print(f"listener mode: {listener.active_mode}")
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    print(f"write -> event   p50 {p50:8.2f} ms   p99 {p99:8.2f} ms")
+    await database.client.drop_database("blog_changes_bench")
+    database.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017/?replicaSet=rs0")
+    parser.add_argument("--mode", choices=["auto", "stream", "poll"], default="auto")
+    parser.add_argument("--writes", type=int, default=200)
+    asyncio.run(main(parser.parse_args()))
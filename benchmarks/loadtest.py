@@ -0,0 +1,319 @@
+"""
+Load test every router in api/routes/ in-process and write per-endpoint
+throughput and latency percentiles to a JSON file.
+
+The app is driven through httpx's ASGI transport with its lifespan running,
+against either a local mongod or the in-process mongomock-motor stand-in.
+SMTP is stubbed with MAIL_SUPPRESS_SEND. The dataset is seeded from a fixed
+random seed, so two runs on different commits can be diffed:
+
+    python benchmarks/loadtest.py --mongo-uri mongomock:// --out before.json
+    git checkout <other commit>
+    python benchmarks/loadtest.py --mongo-uri mongomock:// --out after.json
+
+A real mongod is wiped of the benchmark database before seeding, so point
+--mongo-uri at a throwaway instance. Requires httpx (and mongomock-motor for
+mongomock://).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+BODY_SIZES = (300, 3_000, 30_000)
+WORDS = ("lorem", "ipsum", "dolor", "sit", "amet", "mongo", "async", "python",
+         "blog", "index", "cursor", "latency", "worker", "queue", "token")
+
+
+def percentile(ordered, pct):
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return round(ordered[index] * 1000, 3)
+
+
+def text(rng, size):
+    out, length = [], 0
+    while length < size:
+        word = rng.choice(WORDS)
+        out.append(word)
+        length += len(word) + 1
+    return " ".join(out)
+
+
+class Dataset:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.users = []
+        self.posts = []
+        # posts reserved for the update and delete scenarios, per user
+        self.owned = {}
+        self.tokens = {}
+
+    async def seed(self, db):
+        from bson import ObjectId
+        from api.Oauth2 import create_access_token
+        from api.utils import get_password_hash
+
+        for name in ("users", "blogPost", "otp"):
+            await db[name].delete_many({})
+
+        # one bcrypt hash shared by every seeded user keeps seeding fast
+        password = get_password_hash(self.args.password)
+        for i in range(self.args.users):
+            user = {
+                "_id": str(ObjectId()),
+                "name": f"bench-user-{i}",
+                "email": f"bench-user-{i}@example.com",
+                "password": password,
+                "verified": False,
+            }
+            self.users.append(user)
+            self.tokens[user["_id"]] = create_access_token({"id": user["_id"]})
+        await db["users"].insert_many(self.users)
+
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        posts = []
+        for i in range(self.args.posts + self.args.users * self.args.owned_posts):
+            author = self.users[i % len(self.users)]
+            posts.append({
+                "_id": str(ObjectId()),
+                "title": text(self.rng, 40),
+                "body": text(self.rng, self.rng.choice(BODY_SIZES)),
+                "author_name": author["name"],
+                "author_id": author["_id"],
+                "created_at": (start + timedelta(seconds=i)).isoformat(),
+            })
+        for i in range(0, len(posts), 1000):
+            await db["blogPost"].insert_many(posts[i:i + 1000])
+        self.posts = posts[:self.args.posts]
+        for post in posts[self.args.posts:]:
+            self.owned.setdefault(post["author_id"], []).append(post["_id"])
+
+    def user(self, i):
+        return self.users[i % len(self.users)]
+
+    def auth(self, user):
+        return {"Authorization": f"Bearer {self.tokens[user['_id']]}"}
+
+
+def scenarios(data: Dataset, db):
+    """
+    One entry per endpoint: name -> async callable(client, i) that issues
+    request number i and returns the response. An optional `prepare(i)`
+    attribute sets up state for that request outside the timed section.
+    """
+    async def list_posts(client, i):
+        return await client.get("/blog/", params={"limit": 20})
+
+    async def get_post(client, i):
+        return await client.get(f"/blog/{data.posts[i % len(data.posts)]['_id']}")
+
+    async def author_posts(client, i):
+        return await client.get(f"/blog/author/{data.user(i)['_id']}", params={"limit": 20})
+
+    async def search(client, i):
+        return await client.get("/blog/search", params={"q": data.rng.choice(WORDS), "limit": 20})
+
+    async def batch(client, i):
+        ids = [data.posts[(i * 20 + n) % len(data.posts)]["_id"] for n in range(20)]
+        return await client.get("/blog/batch", params={"ids": ",".join(ids)})
+
+    async def export(client, i):
+        user = data.user(i)
+        return await client.get("/blog/export", headers=data.auth(user), params={"author_id": user["_id"]})
+
+    async def create_post(client, i):
+        user = data.user(i)
+        return await client.post("/blog/", headers=data.auth(user),
+                                  json={"title": f"new post {i}", "body": text(data.rng, 2000)})
+
+    async def update_post(client, i):
+        user = data.user(i)
+        ids = data.owned[user["_id"]]
+        return await client.put(f"/blog/{ids[i % len(ids)]}", headers=data.auth(user),
+                                json={"title": f"updated {i}", "body": text(data.rng, 2000)})
+
+    async def import_posts(client, i):
+        lines = "".join(json.dumps({"title": f"imported {i}.{n}", "body": text(data.rng, 2000)}) + "\n"
+                        for n in range(data.args.import_lines))
+        return await client.post("/blog/import", headers={**data.auth(data.user(i)), "Content-Type": "application/x-ndjson"},
+                                 content=lines.encode())
+
+    async def delete_post(client, i):
+        user = data.user(i)
+        ids = data.owned[user["_id"]]
+        if not ids:
+            return None
+        return await client.delete(f"/blog/{ids.pop()}", headers=data.auth(user))
+
+    async def login(client, i):
+        user = data.user(i)
+        return await client.post("/login", json={"username": user["name"], "password": data.args.password})
+
+    async def registration(client, i):
+        return await client.post("/registration", json={
+            "name": f"bench-new-{i}", "email": f"bench-new-{i}@example.com", "password": "pw-" + str(i)})
+
+    async def details(client, i):
+        return await client.get("/details", headers=data.auth(data.user(i)))
+
+    async def generate_otp(client, i):
+        return await client.get("/otp", headers=data.auth(data.user(i)))
+
+    from api.otp_store import otp_store
+
+    async def verify_otp(client, i):
+        return await client.post("/otp", headers=data.auth(data.user(i)), json={"otp": 100000 + i})
+
+    async def prepare_verify_otp(i):
+        user = data.user(i)
+        await db["users"].update_one({"_id": user["_id"]}, {"$set": {"verified": False}})
+        await otp_store.issue(user["_id"], str(100000 + i))
+
+    verify_otp.prepare = prepare_verify_otp
+
+    async def password_reset_request(client, i):
+        return await client.post("/password/request/", json={"email": data.user(i)["email"]})
+
+    async def password_reset(client, i):
+        user = data.user(i)
+        return await client.put("/password/reset", params={"token": data.tokens[user["_id"]]},
+                                json={"password": data.args.password})
+
+    # reads first; deletes run last so they cannot starve update_post
+    return {
+        "GET /blog/": list_posts,
+        "GET /blog/{id}": get_post,
+        "GET /blog/author/{id}": author_posts,
+        "GET /blog/search": search,
+        "GET /blog/batch": batch,
+        "GET /blog/export": export,
+        "GET /details": details,
+        "POST /blog/": create_post,
+        "PUT /blog/{id}": update_post,
+        "POST /blog/import": import_posts,
+        "POST /login": login,
+        "POST /registration": registration,
+        "GET /otp": generate_otp,
+        "POST /otp": verify_otp,
+        "POST /password/request/": password_reset_request,
+        "PUT /password/reset": password_reset,
+        "DELETE /blog/{id}": delete_post,
+    }
+
+
+async def drive(client, fn, requests, concurrency):
+    latencies, errors = [], 0
+    counter = iter(range(requests))
+    prepare = getattr(fn, "prepare", None)
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            if prepare is not None:
+                await prepare(i)
+            start = time.perf_counter()
+            response = await fn(client, i)
+            elapsed = time.perf_counter() - start
+            if response is None:
+                continue
+            latencies.append(elapsed)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else None,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main(args):
+    os.environ["MONGO_URI"] = args.mongo_uri
+    os.environ["MAIL_SUPPRESS_SEND"] = "true"
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    os.environ["CHANGE_LISTENER"] = "off"
+    # measure endpoint latency, not shedding; benchmarks/overload.py covers the limiter
+    os.environ["CONCURRENCY_LIMIT_ENABLED"] = "false"
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    os.environ.setdefault("MAIL_FROM", "loadtest@example.com")
+    if args.mongo_uri.startswith("mongomock://"):
+        # mongomock has no $text
+        os.environ.setdefault("SEARCH_BACKEND", "memory")
+
+    import httpx
+    from api.main import app
+    from api.schemas import db
+    from api.migrations import run_migrations
+    from api.search import search_backend
+
+    selected = set(args.endpoint or [])
+    async with app.router.lifespan_context(app):
+        data = Dataset(args)
+        await data.seed(db)
+        # the seed bypasses the write routes that keep the index and the
+        # stored post counts current
+        await search_backend.rebuild(db)
+        await run_migrations(db)
+        transport = httpx.ASGITransport(app=app)
+        results = {}
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name, fn in scenarios(data, db).items():
+                if selected and name not in selected:
+                    continue
+                requests = args.slow_requests if name in SLOW else args.requests
+                results[name] = await drive(client, fn, requests, args.concurrency)
+                print(f"{name:<26} {json.dumps(results[name])}")
+
+    report = {
+        "commit": git_commit(),
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "config": {key: value for key, value in vars(args).items() if key != "out"},
+        "endpoints": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {args.out}")
+
+
+# endpoints that run bcrypt or move many posts; they get fewer requests so a run stays short
+SLOW = {"POST /login", "POST /registration", "PUT /password/reset", "GET /blog/export", "POST /blog/import"}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mongo-uri", default="mongomock://")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--posts", type=int, default=5000)
+    parser.add_argument("--owned-posts", type=int, default=20, help="extra posts per user for PUT/DELETE")
+    parser.add_argument("--requests", type=int, default=500, help="requests per endpoint")
+    parser.add_argument("--slow-requests", type=int, default=50, help="requests per bcrypt, export or import endpoint")
+    parser.add_argument("--import-lines", type=int, default=100, help="posts per POST /blog/import request")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--password", default="bench-password")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--endpoint", action="append", help="only run this endpoint, e.g. 'GET /blog/'")
+    parser.add_argument("--out", default="bench_results.json")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,134 @@
+"""
+Measure GET /blog/ latency while a storm of concurrent logins hits the server.
+
+By default the app runs in-process (httpx ASGI transport, lifespan running)
+on the mongomock-motor stand-in, with a seeded user. Compare bcrypt inline on
+the event loop (the old behaviour) with the process pool:
+
+    python benchmarks/login_storm.py --hash-pool-size 0
+    python benchmarks/login_storm.py
+
+Rate limiting and the concurrency limiter are switched off, since they would
+turn most of the storm into fast 429s and 503s. Responses other than 200 are
+counted and reported separately, never as logins.
+
+With --url the storm goes to a running server instead; start it with
+RATE_LIMIT_ENABLED=false CONCURRENCY_LIMIT_ENABLED=false, and the user must
+already exist. Requires httpx.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def login_storm(client, args, stop, statuses):
+    async def one():
+        while not stop.is_set():
+            response = await client.post("/login", json={"username": args.username, "password": args.password})
+            statuses[response.status_code] += 1
+            # in-process on mongomock nothing in a login suspends; yield as
+            # separate clients would, or inline hashing starves everything else
+            await asyncio.sleep(0)
+
+    await asyncio.gather(*(one() for _ in range(args.logins)))
+
+
+async def read_blog(client, args, stop, latencies, statuses):
+    while not stop.is_set():
+        start = time.perf_counter()
+        response = await client.get("/blog/")
+        statuses[response.status_code] += 1
+        if response.status_code == 200:
+            latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(args.read_interval)
+
+
+async def storm(client, args):
+    stop = asyncio.Event()
+    latencies = []
+    logins, reads = Counter(), Counter()
+    tasks = [
+        asyncio.create_task(login_storm(client, args, stop, logins)),
+        asyncio.create_task(read_blog(client, args, stop, latencies, reads)),
+    ]
+    await asyncio.sleep(args.duration)
+    stop.set()
+    await asyncio.gather(*tasks)
+
+    print(f"POST /login: {logins[200]} logins ({logins[200] / args.duration:.1f}/s) "
+          f"from {args.logins} concurrent loops")
+    print(f"GET /blog/ samples: {len(latencies)}")
+    if latencies:
+        print(f"p50 {statistics.median(latencies):.1f} ms")
+        print(f"p99 {percentile(latencies, 99):.1f} ms")
+    for name, statuses in (("POST /login", logins), ("GET /blog/", reads)):
+        rejected = {code: count for code, count in sorted(statuses.items()) if code != 200}
+        if rejected:
+            print(f"{name} non-200 responses, not counted above: {rejected}")
+
+
+async def seed(db, args):
+    from api.utils import get_password_hash
+
+    await db["users"].insert_one({
+        "_id": "login-storm-user",
+        "name": args.username,
+        "email": f"{args.username}@example.com",
+        "password": get_password_hash(args.password),
+        "verified": False,
+        "post_count": 0,
+    })
+
+
+async def main(args):
+    if args.url:
+        limits = httpx.Limits(max_connections=args.logins + 4)
+        async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60) as client:
+            await storm(client, args)
+        return
+
+    os.environ["MONGO_URI"] = args.mongo_uri
+    os.environ["MAIL_SUPPRESS_SEND"] = "true"
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    os.environ["CONCURRENCY_LIMIT_ENABLED"] = "false"
+    os.environ["CHANGE_LISTENER"] = "off"
+    if args.hash_pool_size is not None:
+        os.environ["HASH_POOL_SIZE"] = str(args.hash_pool_size)
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    os.environ.setdefault("MAIL_FROM", "login-storm@example.com")
+
+    from api.main import app
+    from api.schemas import db
+
+    async with app.router.lifespan_context(app):
+        await seed(db, args)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            await storm(client, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", help="run against this server instead of in-process")
+    parser.add_argument("--mongo-uri", default="mongomock://", help="in-process only")
+    parser.add_argument("--hash-pool-size", type=int, help="in-process only; 0 hashes on the event loop")
+    parser.add_argument("--username", default="bench")
+    parser.add_argument("--password", default="bench-password")
+    parser.add_argument("--logins", type=int, default=32, help="concurrent login loops")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds")
+    parser.add_argument("--read-interval", type=float, default=0.05, help="seconds between reads")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,68 @@
+"""
+Measure the cost of the metrics registry: raw counter and histogram updates,
+and a request through MetricsMiddleware compared with the bare ASGI app.
+
+    python benchmarks/metrics_overhead.py --iterations 200000
+
+Run from the repository root.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from api.metrics import Counter, Histogram, MetricsMiddleware  # noqa: E402
+
+
+def report(label, elapsed, iterations):
+    print(f"{label:<32} {elapsed / iterations * 1e9:8.0f} ns/op")
+
+
+async def bare_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def drive(app, iterations):
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        scope = {"type": "http", "method": "GET", "path": "/blog/", "headers": []}
+        await app(scope, receive, send)
+    return time.perf_counter() - start
+
+
+def main(args):
+    n = args.iterations
+    counter = Counter("bench_total", "benchmark", ("method", "route", "status"))
+    histogram = Histogram("bench_seconds", "benchmark", ("method", "route"))
+
+    start = time.perf_counter()
+    for _ in range(n):
+        counter.inc("GET", "/blog/", "200")
+    report("Counter.inc", time.perf_counter() - start, n)
+
+    start = time.perf_counter()
+    for i in range(n):
+        histogram.observe((i % 1000) / 10000, "GET", "/blog/")
+    report("Histogram.observe", time.perf_counter() - start, n)
+
+    bare = asyncio.run(drive(bare_app, n))
+    wrapped = asyncio.run(drive(MetricsMiddleware(bare_app), n))
+    report("ASGI request, bare", bare, n)
+    report("ASGI request, MetricsMiddleware", wrapped, n)
+    report("middleware overhead", wrapped - bare, n)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=200000)
+    main(parser.parse_args())
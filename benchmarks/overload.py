@@ -0,0 +1,106 @@
+"""
+Show goodput under overload with and without the adaptive concurrency
+limiter. Requests arrive open-loop (like real clients, they do not wait
+for each other) at multiples of what a simulated downstream can serve: it
+handles `--capacity` requests at once in `--service-ms`, and slows down
+proportionally beyond that, the way a saturated Mongo pool or CPU does.
+
+Goodput is successful responses per second that finished within the SLO.
+Without the limiter, in-flight work grows until everything is slower than
+the SLO; with it, excess requests get a fast 503 and goodput stays near
+capacity.
+
+    python benchmarks/overload.py --capacity 20 --service-ms 20 --slo-ms 500
+
+Run from the repository root.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from api.concurrency import AdaptiveLimiter, ConcurrencyMiddleware  # noqa: E402
+
+
+def downstream(capacity, service):
+    in_flight = 0
+
+    async def app(scope, receive, send):
+        nonlocal in_flight
+        in_flight += 1
+        try:
+            await asyncio.sleep(service * max(1.0, in_flight / capacity))
+        finally:
+            in_flight -= 1
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    return app
+
+
+async def run(args, multiplier, limited):
+    app = downstream(args.capacity, args.service_ms / 1000)
+    limiter = AdaptiveLimiter("read", initial=args.capacity, min_limit=1, max_limit=1000,
+                              queue_size=args.capacity * 2, target=args.target_ms / 1000,
+                              queue_timeout=args.target_ms / 1000)
+    if limited:
+        app = ConcurrencyMiddleware(app, {"read": limiter})
+    rate = multiplier * args.capacity / (args.service_ms / 1000)
+    good, shed, slow, latencies = 0, 0, 0, []
+
+    async def one():
+        nonlocal good, shed, slow
+        status = {}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+
+        start = time.perf_counter()
+        await app({"type": "http", "method": "GET", "path": "/blog/"}, None, send)
+        elapsed = time.perf_counter() - start
+        if status["code"] != 200:
+            shed += 1
+        elif elapsed <= args.slo_ms / 1000:
+            good += 1
+            latencies.append(elapsed)
+        else:
+            slow += 1
+
+    tasks = []
+    started = time.perf_counter()
+    sent = 0
+    while time.perf_counter() - started < args.seconds:
+        due = int((time.perf_counter() - started) * rate)
+        for _ in range(due - sent):
+            tasks.append(asyncio.create_task(one()))
+        sent = max(sent, due)
+        await asyncio.sleep(0.001)
+    await asyncio.gather(*tasks)
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else float("nan")
+    label = "limited" if limited else "unlimited"
+    print(f"{multiplier:>4}x load {label:<10} goodput {good / args.seconds:8.1f}/s   "
+          f"slow {slow:6d}   shed {shed:6d}   p99 ok {p99:8.1f} ms   "
+          f"final limit {int(limiter.limit) if limited else '-'}")
+
+
+async def main(args):
+    print(f"capacity {args.capacity / (args.service_ms / 1000):.0f} req/s, SLO {args.slo_ms} ms")
+    for multiplier in args.load:
+        for limited in (False, True):
+            await run(args, multiplier, limited)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--capacity", type=int, default=20, help="requests the downstream serves at once")
+    parser.add_argument("--service-ms", type=float, default=20)
+    parser.add_argument("--target-ms", type=float, default=100, help="limiter latency target")
+    parser.add_argument("--slo-ms", type=float, default=500)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--load", type=float, nargs="+", default=[0.5, 1, 2, 4])
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,49 @@
+"""
+Measure what the RateLimit dependency adds to a request: a bucket update in
+the in-memory backend, with few hot keys and with many distinct clients.
+With --mongo-uri the shared mongo backend is measured too.
+
+    python benchmarks/ratelimit.py --iterations 100000
+    python benchmarks/ratelimit.py --mongo-uri mongodb://localhost:27017
+
+Run from the repository root.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+
+from api import ratelimit  # noqa: E402
+
+
+async def run(label, backend, iterations, keys):
+    capacity, refill = ratelimit.parse_rate("10/minute")
+    start = time.perf_counter()
+    for i in range(iterations):
+        await backend.take(f"/login|ip:10.0.{i % keys // 256}.{i % 256}", capacity, refill)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed / iterations * 1e6:8.2f} us/request")
+
+
+async def main(args):
+    await run("memory, 10 clients", ratelimit.MemoryBuckets(), args.iterations, 10)
+    await run("memory, 50k clients", ratelimit.MemoryBuckets(), args.iterations, 50000)
+
+    if args.mongo_uri:
+        import motor.motor_asyncio
+
+        client = motor.motor_asyncio.AsyncIOMotorClient(args.mongo_uri)
+        ratelimit.db = client.blog_ratelimit_bench
+        await run("mongo, 10 clients", ratelimit.MongoBuckets(), args.iterations // 100, 10)
+        await client.drop_database("blog_ratelimit_bench")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=100000)
+    parser.add_argument("--mongo-uri")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,96 @@
+"""
+Benchmark search latency on a synthetic corpus (100k posts by default).
+
+The in-memory inverted index is always measured. With --mongo-uri the same
+corpus is loaded into a throwaway mongod (database blog_search_bench) and
+the $text backend is measured too.
+
+    python benchmarks/search.py --posts 100000 --queries 200
+    python benchmarks/search.py --mongo-uri mongodb://localhost:27017
+
+Run from the repository root.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from api.search import InvertedIndexSearch, MongoTextSearch  # noqa: E402
+
+VOCABULARY_SIZE = 20000
+
+
+def corpus(rng, posts, words_per_post):
+    # Zipf-ish word frequencies, like natural text
+    vocabulary = [f"w{i}" for i in range(VOCABULARY_SIZE)]
+    weights = [1 / (rank + 1) for rank in range(VOCABULARY_SIZE)]
+    for i in range(posts):
+        title = " ".join(rng.choices(vocabulary, weights, k=6))
+        body = " ".join(rng.choices(vocabulary, weights, k=words_per_post))
+        yield {"_id": f"{i:024x}", "title": title, "body": body}
+
+
+def queries(rng, count):
+    # mix of common, mid-frequency and rare terms
+    return [" ".join(f"w{int(rng.paretovariate(0.8)) % VOCABULARY_SIZE}" for _ in range(rng.randint(1, 3)))
+            for _ in range(count)]
+
+
+def summarize(label, latencies):
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    print(f"{label:<22} p50 {p50:8.2f} ms   p99 {p99:8.2f} ms")
+
+
+async def main(args):
+    rng = random.Random(args.seed)
+    posts = list(corpus(rng, args.posts, args.words))
+    qs = queries(rng, args.queries)
+
+    index = InvertedIndexSearch()
+    start = time.perf_counter()
+    for post in posts:
+        index.add(post["_id"], post["title"], post["body"])
+    print(f"indexed {len(posts)} posts in {time.perf_counter() - start:.1f} s")
+
+    latencies = []
+    for q in qs:
+        start = time.perf_counter()
+        index.rank(q, args.limit + 1)
+        latencies.append(time.perf_counter() - start)
+    summarize("memory (rank only)", latencies)
+
+    if args.mongo_uri:
+        import motor.motor_asyncio
+        from api.indexes import INDEXES
+
+        client = motor.motor_asyncio.AsyncIOMotorClient(args.mongo_uri)
+        db = client.blog_search_bench
+        await db["blogPost"].drop()
+        for i in range(0, len(posts), 5000):
+            await db["blogPost"].insert_many(posts[i:i + 5000])
+        await db["blogPost"].create_indexes([m for m in INDEXES["blogPost"] if m.document["name"] == "title_body_text"])
+        backend = MongoTextSearch()
+        latencies = []
+        for q in qs:
+            start = time.perf_counter()
+            await backend.search(db, q, args.limit, None, {"title": 1})
+            latencies.append(time.perf_counter() - start)
+        summarize("mongo $text", latencies)
+        await client.drop_database("blog_search_bench")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--posts", type=int, default=100000)
+    parser.add_argument("--words", type=int, default=150, help="body words per post")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mongo-uri")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,75 @@
+"""
+Compare the CPU cost of serializing a GET /blog/ page the default FastAPI way
+(validate against BlogContentPage, jsonable_encoder, json.dumps) with the
+trusted-document path in api.responses (project + orjson).
+
+    python benchmarks/serialization.py --items 20 --body-size 20000
+
+Run from the repository root.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bson import ObjectId  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+from api.responses import DocumentResponse, project  # noqa: E402
+from api.schemas import BlogContentPage, BlogContentResponse  # noqa: E402
+
+
+def make_page(items, body_size):
+    now = datetime.now(timezone.utc).isoformat()
+    return {
+        "items": [{
+            "_id": str(ObjectId()),
+            "title": f"post {i}",
+            "body": "x" * body_size,
+            "author_name": "bench",
+            "author_id": str(ObjectId()),
+            "created_at": now,
+        } for i in range(items)],
+        "next": None,
+    }
+
+
+def default_path(adapter, page):
+    model = adapter.validate_python(page)
+    return json.dumps(jsonable_encoder(model, by_alias=True)).encode()
+
+
+def fast_path(page):
+    out = {"items": [project(BlogContentResponse, item) for item in page["items"]], "next": page["next"]}
+    return DocumentResponse(out).body
+
+
+def timed(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main(args):
+    adapter = TypeAdapter(BlogContentPage)
+    page = make_page(args.items, args.body_size)
+    slow = timed(lambda: default_path(adapter, page), args.iterations)
+    fast = timed(lambda: fast_path(page), args.iterations)
+    print(f"page of {args.items} posts, {args.body_size} byte bodies")
+    print(f"validate + jsonable_encoder  {slow:10.1f} us/request")
+    print(f"project + DocumentResponse   {fast:10.1f} us/request")
+    print(f"saved                        {slow - fast:10.1f} us/request ({slow / fast:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=20)
+    parser.add_argument("--body-size", type=int, default=5000)
+    parser.add_argument("--iterations", type=int, default=2000)
+    main(parser.parse_args())
@@ -0,0 +1,69 @@
+"""
+Compare mail template render throughput: Jinja's render against the
+precompiled chunks in api.mail_templates, and a batch template with the
+shared values bound once. Also times building the full EmailMessage, which
+is what each queued mail costs the request.
+
+    python benchmarks/templates.py --renders 20000
+
+Run from the repository root.
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from api.mail_templates import CompiledTemplate, MailTemplates  # noqa: E402
+
+TEMPLATE_DIR = Path(__file__).parent.parent / "api" / "templates"
+
+BODIES = {
+    "registration.html": {"title": "Registration", "name": "Jane"},
+    "password_reset.html": {"title": "Password Reset", "name": "Jane",
+                            "reset_link": "http://localhost:8000/reset?token=abc.def.ghi"},
+    "otp_verification.html": {"title": "OTP", "name": "Jane", "otp": "123456"},
+    "announcement.html": {"title": "News", "name": "Jane", "message": "We have <new> features & fixes."},
+}
+
+
+def run(label, renders, fn):
+    start = time.perf_counter()
+    for i in range(renders):
+        fn(i)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<44} {renders / elapsed:12,.0f} renders/s")
+
+
+def main(args):
+    templates = MailTemplates(TEMPLATE_DIR)
+    templates.load()
+    for name, body in BODIES.items():
+        jinja = templates.env.get_template(name)
+        compiled = templates.get(name)
+        if not isinstance(compiled, CompiledTemplate):
+            print(f"{name}: not precompiled, skipping")
+            continue
+        assert compiled.render(body) == jinja.render(**body)
+        bound = compiled.bind({k: v for k, v in body.items() if k != "name"})
+        print(name)
+        run("  jinja", args.renders, lambda i: jinja.render(**body))
+        run("  precompiled", args.renders, lambda i: compiled.render(body))
+        run("  precompiled, shared values bound", args.renders, lambda i: bound.render({"name": f"user{i}"}))
+
+    if args.message:
+        os.environ.setdefault("MAIL_FROM", "blog@example.com")
+        from api.send_mail import build_message
+        run("build_message (render + EmailMessage)", args.renders // 10,
+            lambda i: build_message("Password Reset", "jane@example.com", "password_reset.html",
+                                    BODIES["password_reset.html"]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--renders", type=int, default=20000)
+    parser.add_argument("--message", action="store_true",
+                        help="also time build_message (imports the app settings)")
+    main(parser.parse_args())
@@ -0,0 +1,39 @@
+import os
+import sys
+from contextlib import asynccontextmanager
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# the api modules read their configuration at import; keep the suite off
+# real services
+os.environ.setdefault("MONGO_URI", "mongomock://")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("MAIL_FROM", "tests@example.com")
+os.environ.setdefault("MAIL_SUPPRESS_SEND", "true")
+os.environ.setdefault("CHANGE_LISTENER", "off")
+os.environ.setdefault("SEARCH_BACKEND", "memory")
+os.environ.setdefault("HASH_POOL_SIZE", "0")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("CONCURRENCY_LIMIT_ENABLED", "false")
+
+
+@pytest.fixture
+def api():
+    """
+    Returns an async context manager running the app's lifespan on a fresh
+    mongomock database and yielding (httpx client, db).
+    """
+    @asynccontextmanager
+    async def running():
+        import httpx
+        from api.main import app
+        from api.schemas import db
+
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                yield client, db
+
+    return running
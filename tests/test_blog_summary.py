@@ -0,0 +1,50 @@
+import asyncio
+
+from api.migrations import backfill_post_summaries
+from api.utils import summarize
+
+LEGACY_BODY = ("word\t" * 30 + "tail\nwith  several   spaces ") * 10
+
+
+def legacy_post(id: str) -> dict:
+    # written before excerpt and word_count were stored
+    return {
+        "_id": id,
+        "title": "legacy",
+        "body": LEGACY_BODY,
+        "author_id": "author",
+        "author_name": "Author",
+        "created_at": "2024-01-01T00:00:00+00:00",
+    }
+
+
+def test_backfill_matches_summarize(api):
+    async def run():
+        async with api() as (client, db):
+            await db["blogPost"].insert_one(legacy_post("legacy-1"))
+            assert await backfill_post_summaries(db) == 1
+            # done once: nothing left to update
+            assert await backfill_post_summaries(db) == 0
+            stored = await db["blogPost"].find_one({"_id": "legacy-1"})
+            response = await client.get("/blog/", params={"view": "summary", "limit": 10})
+            return stored, response
+
+    stored, response = asyncio.run(run())
+    expected = summarize(LEGACY_BODY)
+    assert {k: stored[k] for k in expected} == expected
+    assert response.status_code == 200
+    [item] = response.json()["items"]
+    assert item["excerpt"] == expected["excerpt"]
+    assert item["word_count"] == expected["word_count"]
+    assert "body" not in item
+
+
+def test_backfill_leaves_edited_posts_alone(api):
+    async def run():
+        async with api() as (client, db):
+            edited = {**legacy_post("legacy-2"), "excerpt": "new", "word_count": 1}
+            await db["blogPost"].insert_many([legacy_post("legacy-1"), edited])
+            await backfill_post_summaries(db, batch_size=1)
+            return await db["blogPost"].find_one({"_id": "legacy-2"})
+
+    assert asyncio.run(run())["excerpt"] == "new"
@@ -0,0 +1,246 @@
+"""
+ChangeListener on mongomock: polling for real, change streams through a
+scripted stand-in for `db.watch`, since mongomock has no change streams.
+"""
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from pymongo.errors import AutoReconnect, OperationFailure
+
+from api import changes
+from api.changes import DELETE, INSERT, RESET, UPDATE, ChangeListener, EventBus
+from api.database import database
+
+
+@pytest.fixture(autouse=True)
+def fast(monkeypatch):
+    monkeypatch.setattr(changes, "CHANGE_POLL_INTERVAL", 0.05)
+    monkeypatch.setattr(changes, "CHANGE_RECONNECT_BACKOFF", 0.01)
+
+
+def now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+async def wait_for(predicate, timeout: float = 2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def collect(bus: EventBus, collection: str = "blogPost") -> list:
+    events = []
+
+    async def subscriber(event):
+        events.append((event.collection, event.operation, event.id))
+
+    bus.subscribe(collection, subscriber)
+    return events
+
+
+class Stream:
+    """
+    What db.watch() returns: yields `changes`, each with its resume token,
+    then stays open like an idle change stream, or raises `error` on open,
+    or `dropped` once the changes are out.
+    """
+
+    def __init__(self, changes=(), error=None, dropped=None):
+        self.changes = changes
+        self.error = error
+        self.dropped = dropped
+        self.resume_token = None
+
+    async def __aenter__(self):
+        if self.error is not None:
+            raise self.error
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def __aiter__(self):
+        for token, change in self.changes:
+            self.resume_token = token
+            yield change
+        if self.dropped is not None:
+            raise self.dropped
+        await asyncio.Event().wait()
+
+
+class Watch:
+    def __init__(self, *streams):
+        self.streams = list(streams)
+        self.start_after = []
+
+    def __call__(self, pipeline, full_document=None, start_after=None):
+        self.start_after.append(start_after)
+        return self.streams.pop(0) if self.streams else Stream()
+
+
+def change(operation: str, id, coll: str = "blogPost") -> dict:
+    return {"operationType": operation, "ns": {"db": "blog_api", "coll": coll},
+            "documentKey": {"_id": id}, "fullDocument": {"_id": id}}
+
+
+def not_a_replica_set() -> OperationFailure:
+    return OperationFailure("The $changeStream stage is only supported on replica sets",
+                            code=changes.NOT_A_REPLICA_SET)
+
+
+async def poll_round_trip(listener: ChangeListener, db, events: list):
+    await wait_for(lambda: listener.active_mode == "poll")
+    stamp = now()
+    await db["blogPost"].insert_one({"_id": "p1", "created_at": stamp, "updated_at": stamp})
+    await wait_for(lambda: ("blogPost", INSERT, "p1") in events)
+    await db["blogPost"].update_one({"_id": "p1"}, {"$set": {"updated_at": now()}})
+    await wait_for(lambda: ("blogPost", UPDATE, "p1") in events)
+    # a delete leaves nothing to find; the shrinking count points at it
+    await db["blogPost"].delete_one({"_id": "p1"})
+    await wait_for(lambda: ("blogPost", DELETE, "p1") in events)
+
+
+def test_poll_mode(api):
+    async def run():
+        async with api() as (client, db):
+            bus = EventBus()
+            events = collect(bus)
+            listener = ChangeListener(bus, ["blogPost"], mode="poll", name="test")
+            await listener.start()
+            try:
+                await poll_round_trip(listener, db, events)
+            finally:
+                await listener.stop()
+            return events
+
+    events = asyncio.run(run())
+    # each write published once, despite the overlapping polls
+    assert events == [("blogPost", INSERT, "p1"), ("blogPost", UPDATE, "p1"), ("blogPost", DELETE, "p1")]
+
+
+def test_poll_publishes_only_the_deleted_ids(api):
+    async def run():
+        async with api() as (client, db):
+            # present before the listener starts, and never updated
+            await db["blogPost"].insert_many([{"_id": f"old{n}"} for n in range(5)])
+            bus = EventBus()
+            events = collect(bus)
+            listener = ChangeListener(bus, ["blogPost"], mode="poll", name="test")
+            await listener.start()
+            try:
+                await wait_for(lambda: listener.active_mode == "poll")
+                await asyncio.sleep(0.1)
+                await db["blogPost"].delete_many({"_id": {"$in": ["old1", "old3"]}})
+                await wait_for(lambda: len(events) == 2)
+                await asyncio.sleep(0.15)
+            finally:
+                await listener.stop()
+            return events
+
+    events = asyncio.run(run())
+    assert sorted(events) == [("blogPost", DELETE, "old1"), ("blogPost", DELETE, "old3")]
+
+
+def test_auto_falls_back_to_polling_without_a_replica_set(api, monkeypatch):
+    async def run():
+        async with api() as (client, db):
+            monkeypatch.setattr(database.db, "watch", Watch(Stream(error=not_a_replica_set())), raising=False)
+            bus = EventBus()
+            events = collect(bus)
+            listener = ChangeListener(bus, ["blogPost"], mode="auto", name="test")
+            await listener.start()
+            try:
+                await poll_round_trip(listener, db, events)
+            finally:
+                await listener.stop()
+
+    asyncio.run(run())
+
+
+def test_stream_mode_does_not_fall_back(api, monkeypatch):
+    async def run():
+        async with api() as (client, db):
+            monkeypatch.setattr(database.db, "watch", Watch(Stream(error=not_a_replica_set())), raising=False)
+            listener = ChangeListener(EventBus(), ["blogPost"], mode="stream", name="test")
+            await listener.start()
+            # polling would never finish; the listener gives up instead
+            await asyncio.wait_for(asyncio.shield(listener._task), 2)
+            await listener.stop()
+            return listener.active_mode
+
+    assert asyncio.run(run()) == "stream"
+
+
+def test_stream_publishes_and_persists_the_resume_token(api, monkeypatch):
+    async def run():
+        async with api() as (client, db):
+            watch = Watch(Stream([("t1", change("insert", "a")), ("t2", change("delete", "a"))]))
+            monkeypatch.setattr(database.db, "watch", watch, raising=False)
+            bus = EventBus()
+            events = collect(bus)
+            listener = ChangeListener(bus, ["blogPost"], mode="stream", name="test")
+            await listener.start()
+            await wait_for(lambda: len(events) == 2)
+            await listener.stop()
+            saved = await db["changeStreams"].find_one({"_id": "test"})
+
+            # a restarted worker resumes after the saved token
+            restarted = Watch()
+            monkeypatch.setattr(database.db, "watch", restarted, raising=False)
+            listener = ChangeListener(EventBus(), ["blogPost"], mode="stream", name="test")
+            await listener.start()
+            await wait_for(lambda: restarted.start_after)
+            await listener.stop()
+            return events, saved, watch.start_after, restarted.start_after
+
+    events, saved, first, restarted = asyncio.run(run())
+    assert events == [("blogPost", INSERT, "a"), ("blogPost", DELETE, "a")]
+    assert saved["token"] == "t2"
+    assert first == [None]
+    assert restarted == ["t2"]
+
+
+def test_lost_resume_token_restarts_from_now_and_resets(api, monkeypatch):
+    async def run():
+        async with api() as (client, db):
+            await db["changeStreams"].insert_one({"_id": "test", "token": "stale"})
+            history_lost = OperationFailure("history lost", code=286)
+            watch = Watch(Stream(error=history_lost), Stream([("t1", change("update", "b"))]))
+            monkeypatch.setattr(database.db, "watch", watch, raising=False)
+            bus = EventBus()
+            events = collect(bus)
+            listener = ChangeListener(bus, ["blogPost"], mode="stream", name="test")
+            await listener.start()
+            await wait_for(lambda: len(events) == 2)
+            await listener.stop()
+            return events, watch.start_after, await db["changeStreams"].find_one({"_id": "test"})
+
+    events, start_after, saved = asyncio.run(run())
+    assert start_after == ["stale", None]
+    assert events == [("blogPost", RESET, None), ("blogPost", UPDATE, "b")]
+    assert saved["token"] == "t1"
+
+
+def test_dropped_stream_reconnects_after_the_last_change(api, monkeypatch):
+    async def run():
+        async with api() as (client, db):
+            watch = Watch(
+                Stream([("t1", change("insert", "c"))], dropped=AutoReconnect("connection reset")),
+                Stream(error=OperationFailure("interrupted", code=11601)),
+                Stream([("t2", change("update", "c"))]),
+            )
+            monkeypatch.setattr(database.db, "watch", watch, raising=False)
+            bus = EventBus()
+            events = collect(bus)
+            listener = ChangeListener(bus, ["blogPost"], mode="stream", name="test")
+            await listener.start()
+            await wait_for(lambda: len(events) == 2)
+            await listener.stop()
+            return events, watch.start_after
+
+    events, start_after = asyncio.run(run())
+    assert events == [("blogPost", INSERT, "c"), ("blogPost", UPDATE, "c")]
+    # neither failure loses the position or resets subscribers
+    assert start_after == [None, "t1", "t1"]
@@ -0,0 +1,134 @@
+import asyncio
+
+import pytest
+
+import api.concurrency
+from api.concurrency import AdaptiveLimiter, Overloaded
+
+
+def limiter(limit: int = 1, queue_size: int = 4, queue_timeout: float = 1.0) -> AdaptiveLimiter:
+    return AdaptiveLimiter("test", initial=limit, min_limit=1, max_limit=limit, queue_size=queue_size,
+                           target=10.0, queue_timeout=queue_timeout)
+
+
+def drained(limiter: AdaptiveLimiter) -> bool:
+    return limiter.in_flight == 0 and limiter.stats()["queued"] == 0
+
+
+async def queued(limiter: AdaptiveLimiter) -> asyncio.Task:
+    task = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    assert not task.done()
+    return task
+
+
+def test_release_hands_the_slot_to_the_first_waiter():
+    async def run():
+        lim = limiter()
+        await lim.acquire()
+        first, second = await queued(lim), await queued(lim)
+        assert lim.stats()["queued"] == 2
+
+        lim.release(0.001, True)
+        await first
+        # handed over, not freed and taken again
+        assert lim.in_flight == 1 and not second.done()
+        lim.release(0.001, True)
+        await second
+        assert lim.in_flight == 1
+        lim.release(0.001, True)
+        return lim
+
+    lim = asyncio.run(run())
+    assert drained(lim)
+    assert lim.accepted == 3
+
+
+def test_full_queue_is_rejected_at_once():
+    async def run():
+        lim = limiter(queue_size=1)
+        await lim.acquire()
+        waiting = await queued(lim)
+        with pytest.raises(Overloaded) as rejected:
+            await lim.acquire()
+        lim.release(0.001, True)
+        await waiting
+        lim.release(0.001, True)
+        return lim, rejected.value
+
+    lim, rejected = asyncio.run(run())
+    assert rejected.reason == "queue_full"
+    assert drained(lim)
+    assert lim.rejected == 1
+
+
+def test_queue_timeout_leaves_the_queue():
+    async def run():
+        lim = limiter(queue_timeout=0.01)
+        await lim.acquire()
+        with pytest.raises(Overloaded) as rejected:
+            await lim.acquire()
+        assert lim.stats()["queued"] == 0
+        lim.release(0.001, True)
+        return lim, rejected.value
+
+    lim, rejected = asyncio.run(run())
+    assert rejected.reason == "queue_timeout"
+    assert drained(lim)
+    assert lim.timeouts == 1
+
+
+def test_slot_granted_as_the_wait_times_out_is_kept(monkeypatch):
+    lim = limiter()
+
+    async def wait_for(waiter, timeout):
+        # the release lands in the same loop iteration as the timeout
+        lim.release(0.001, True)
+        assert waiter.done()
+        raise asyncio.TimeoutError
+
+    async def run():
+        await lim.acquire()
+        monkeypatch.setattr(api.concurrency.asyncio, "wait_for", wait_for)
+        await lim.acquire()
+        assert lim.in_flight == 1
+        lim.release(0.001, True)
+
+    asyncio.run(run())
+    assert drained(lim)
+    assert lim.timeouts == 0
+
+
+def test_cancelled_while_queued_gives_up_its_place():
+    async def run():
+        lim = limiter()
+        await lim.acquire()
+        waiting = await queued(lim)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert lim.stats()["queued"] == 0
+        assert lim.in_flight == 1
+        lim.release(0.001, True)
+        return lim
+
+    assert drained(asyncio.run(run()))
+
+
+def test_cancelled_after_the_grant_frees_the_slot(monkeypatch):
+    lim = limiter()
+
+    async def wait_for(waiter, timeout):
+        # the client goes away right after release() handed it the slot
+        lim.release(0.001, True)
+        assert waiter.done()
+        raise asyncio.CancelledError
+
+    async def run():
+        await lim.acquire()
+        monkeypatch.setattr(api.concurrency.asyncio, "wait_for", wait_for)
+        with pytest.raises(asyncio.CancelledError):
+            await lim.acquire()
+
+    asyncio.run(run())
+    assert drained(lim)
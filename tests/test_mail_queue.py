@@ -0,0 +1,116 @@
+"""
+MailQueue against a local aiosmtpd server (pip install aiosmtpd).
+"""
+import asyncio
+import socket
+from email.message import EmailMessage
+
+import pytest
+
+pytest.importorskip("aiosmtpd")
+from aiosmtpd.controller import Controller
+
+from api.mail_queue import MailQueue, SmtpSettings
+
+
+class Handler:
+    def __init__(self, refuse=()):
+        self.refuse = set(refuse)
+        self.rcpt_attempts = 0
+        self.delivered = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        self.rcpt_attempts += 1
+        if address in self.refuse:
+            return "550 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.delivered.extend(envelope.rcpt_tos)
+        return "250 Message accepted"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def smtpd():
+    handler = Handler(refuse={"nobody@example.com"})
+    controller = Controller(handler, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    yield handler, controller.port
+    controller.stop()
+
+
+def message(to: str) -> EmailMessage:
+    message = EmailMessage()
+    message["Subject"] = "test"
+    message["From"] = "tests@example.com"
+    if to:
+        message["To"] = to
+    message.set_content("<p>hello</p>", subtype="html")
+    return message
+
+
+def make_queue(port: int, **kwargs) -> MailQueue:
+    settings = SmtpSettings("127.0.0.1", port, start_tls=False, timeout=5)
+    return MailQueue(settings, sender="tests@example.com", workers=1, backoff=0.5, **kwargs)
+
+
+def test_delivers_over_one_connection(smtpd):
+    handler, port = smtpd
+
+    async def run():
+        queue = make_queue(port)
+        await queue.start()
+        for n in range(5):
+            queue.enqueue(message(f"user{n}@example.com"))
+        await queue.drain(timeout=10)
+
+    asyncio.run(run())
+    assert handler.delivered == [f"user{n}@example.com" for n in range(5)]
+
+
+def test_refused_recipient_is_not_retried(smtpd):
+    handler, port = smtpd
+
+    async def run():
+        queue = make_queue(port)
+        await queue.start()
+        queue.enqueue(message("nobody@example.com"))
+        queue.enqueue(message("user@example.com"))
+        started = asyncio.get_running_loop().time()
+        await queue.drain(timeout=10)
+        return asyncio.get_running_loop().time() - started
+
+    elapsed = asyncio.run(run())
+    assert handler.rcpt_attempts == 2
+    assert handler.delivered == ["user@example.com"]
+    # a retry would have backed off for at least 0.5s
+    assert elapsed < 0.5
+
+
+def test_worker_survives_unexpected_errors(smtpd):
+    handler, port = smtpd
+
+    async def run():
+        queue = make_queue(port)
+        await queue.start()
+        # no recipient headers: aiosmtplib raises ValueError
+        queue.enqueue(message(""))
+        queue.enqueue(message("user@example.com"))
+        await queue.drain(timeout=10)
+
+    asyncio.run(run())
+    assert handler.delivered == ["user@example.com"]
+
+
+@pytest.mark.parametrize("sender", [None, "", "not an address"])
+def test_start_requires_a_sender(sender):
+    queue = MailQueue(SmtpSettings("127.0.0.1", 25), sender=sender)
+    with pytest.raises(ValueError, match="MAIL_FROM"):
+        asyncio.run(queue.start())
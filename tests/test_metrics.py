@@ -0,0 +1,40 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+
+from api.metrics import MetricsMiddleware, http_requests
+
+
+class Shed:
+    """Answers every request before routing, as ConcurrencyMiddleware does when overloaded."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        await send({"type": "http.response.start", "status": 503, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+
+def test_requests_shed_before_routing_keep_their_route():
+    app = FastAPI()
+
+    @app.get("/metrics-test/{id}")
+    def get_item(id: str):
+        return {}
+
+    app.add_middleware(Shed)
+    app.add_middleware(MetricsMiddleware)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await client.get("/metrics-test/abc")
+            await client.get("/metrics-test-nowhere")
+
+    asyncio.run(run())
+    assert http_requests._values[("GET", "/metrics-test/{id}", "503")] == 1
+    assert http_requests._values[("GET", "unmatched", "503")] >= 1
@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from api.otp_store import INVALID, LOCKED, VERIFIED, MemoryOtpStore, MongoOtpStore
+
+MAX_ATTEMPTS = 3
+
+
+@pytest.fixture(params=[MemoryOtpStore, MongoOtpStore])
+def store(request, api):
+    """
+    Runs `check(store, db)` against a fresh store of each backend; Mongo
+    goes through mongomock.
+    """
+    def run(check, ttl: int = 600):
+        async def main():
+            async with api() as (client, db):
+                otp_store = request.param(ttl, MAX_ATTEMPTS)
+                await otp_store.start()
+                return await check(otp_store, db)
+
+        return asyncio.run(main())
+
+    return run
+
+
+async def attempts(store, db, user_id: str):
+    if isinstance(store, MongoOtpStore):
+        doc = await db["otp"].find_one({"_id": user_id})
+        return doc and doc["attempts"]
+    entry = store._codes.get(user_id)
+    return entry and entry[1]
+
+
+def test_correct_code_is_consumed(store):
+    async def check(otp, db):
+        await otp.issue("u1", "123456")
+        return [await otp.verify("u1", "123456"), await otp.verify("u1", "123456")]
+
+    assert store(check) == [VERIFIED, INVALID]
+
+
+def test_wrong_code_costs_an_attempt(store):
+    async def check(otp, db):
+        await otp.issue("u1", "123456")
+        outcome = await otp.verify("u1", "000000")
+        return outcome, await attempts(otp, db, "u1")
+
+    assert store(check) == (INVALID, 1)
+
+
+def test_locked_code_rejects_even_the_right_value(store):
+    async def check(otp, db):
+        await otp.issue("u1", "123456")
+        outcomes = [await otp.verify("u1", "000000") for _ in range(MAX_ATTEMPTS)]
+        outcomes.append(await otp.verify("u1", "123456"))
+        return outcomes
+
+    assert store(check) == [INVALID] * (MAX_ATTEMPTS - 1) + [LOCKED, LOCKED]
+
+
+def test_reissuing_resets_the_attempts(store):
+    async def check(otp, db):
+        await otp.issue("u1", "123456")
+        for _ in range(MAX_ATTEMPTS):
+            await otp.verify("u1", "000000")
+        await otp.issue("u1", "654321")
+        before = await attempts(otp, db, "u1")
+        return before, await otp.verify("u1", "123456"), await otp.verify("u1", "654321")
+
+    # the reissue cleared the lockout and replaced the old code
+    assert store(check) == (0, INVALID, VERIFIED)
+
+
+def test_codes_are_per_user(store):
+    async def check(otp, db):
+        await otp.issue("u1", "123456")
+        await otp.issue("u2", "123456")
+        return await otp.verify("u2", "123456"), await attempts(otp, db, "u1")
+
+    assert store(check) == (VERIFIED, 0)
+
+
+def test_expired_code_is_invalid(store):
+    async def check(otp, db):
+        await otp.issue("u1", "123456")
+        return await otp.verify("u1", "123456")
+
+    assert store(check, ttl=-1) == INVALID
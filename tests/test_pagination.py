@@ -0,0 +1,50 @@
+import base64
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from api.pagination import decode_cursor, encode_cursor, keyset_filter
+
+
+def raw_cursor(*parts) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(parts)).encode()).decode().rstrip("=")
+
+
+def test_round_trip():
+    cursor = encode_cursor("created_at", "2024-01-01T00:00:00+00:00", "abc")
+    assert decode_cursor(cursor, "created_at") == ("2024-01-01T00:00:00+00:00", "abc")
+    assert keyset_filter("created_at", cursor, {"author_id": "u1"}) == {"$and": [
+        {"author_id": "u1"},
+        {"$or": [
+            {"created_at": {"$lt": "2024-01-01T00:00:00+00:00"}},
+            {"created_at": "2024-01-01T00:00:00+00:00", "_id": {"$lt": "abc"}},
+        ]},
+    ]}
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    raw_cursor("title", "a", "x"),
+    raw_cursor("created_at", {"$gt": ""}, "x"),
+    raw_cursor("created_at", "2024", {"$regex": ".*"}),
+    raw_cursor("created_at", ["a"], "x"),
+    raw_cursor("created_at", 5, "x"),
+    raw_cursor("created_at", True, "x"),
+    raw_cursor("created_at", "2024", None),
+    raw_cursor("created_at", "2024"),
+])
+def test_rejects_malformed_and_operator_cursors(cursor):
+    with pytest.raises(HTTPException) as e:
+        keyset_filter("created_at", cursor)
+    assert e.value.status_code == 400
+
+
+def test_list_route_rejects_operator_cursor(api):
+    import asyncio
+
+    async def run():
+        async with api() as (client, db):
+            return await client.get("/blog/", params={"cursor": raw_cursor("created_at", {"$gt": ""}, "x")})
+
+    assert asyncio.run(run()).status_code == 400
@@ -0,0 +1,134 @@
+import asyncio
+
+from api.migrations import backfill_post_counts, count_posts
+from api.Oauth2 import create_access_token
+from api.routes.blog_content import bump_post_count
+
+
+def post(id: str, author_id: str) -> dict:
+    return {"_id": id, "title": "t", "body": "b", "excerpt": "b", "word_count": 1,
+            "author_id": author_id, "author_name": "Author", "created_at": f"2024-01-01T00:00:0{id[-1]}+00:00"}
+
+
+class RacingPosts:
+    """
+    blogPost whose first count is overtaken by a create, which inserts and
+    bumps the still missing count before the backfill stores its own.
+    """
+
+    def __init__(self, db, author_id):
+        self.db = db
+        self.author_id = author_id
+        self.raced = False
+
+    async def count_documents(self, query):
+        count = await self.db["blogPost"].count_documents(query)
+        if not self.raced:
+            self.raced = True
+            await self.db["blogPost"].insert_one(post("p9", self.author_id))
+            await bump_post_count(self.author_id, 1)
+        return count
+
+
+class RacingDb:
+    def __init__(self, db, author_id):
+        self.db = db
+        self.posts = RacingPosts(db, author_id)
+
+    def __getitem__(self, name):
+        return self.posts if name == "blogPost" else self.db[name]
+
+
+class EarlyPosts:
+    """
+    blogPost where a create inserts just before the backfill's first count.
+    """
+
+    def __init__(self, db, author_id):
+        self.db = db
+        self.author_id = author_id
+        self.raced = False
+
+    async def count_documents(self, query):
+        if not self.raced:
+            self.raced = True
+            await self.db["blogPost"].insert_one(post("p9", self.author_id))
+        return await self.db["blogPost"].count_documents(query)
+
+
+class LateBumpUsers:
+    """
+    users where that create's $inc only lands after the backfill's $set.
+    """
+
+    def __init__(self, db, author_id):
+        self.db = db
+        self.author_id = author_id
+        self.raced = False
+
+    async def update_one(self, query, update):
+        result = await self.db["users"].update_one(query, update)
+        if not self.raced:
+            self.raced = True
+            await bump_post_count(self.author_id, 1)
+        return result
+
+    async def find_one(self, query, projection=None):
+        return await self.db["users"].find_one(query, projection)
+
+
+class LateBumpDb:
+    def __init__(self, db, author_id):
+        self.collections = {"blogPost": EarlyPosts(db, author_id), "users": LateBumpUsers(db, author_id)}
+
+    def __getitem__(self, name):
+        return self.collections[name]
+
+
+def test_backfill_survives_a_concurrent_create(api):
+    async def run():
+        async with api() as (client, db):
+            await db["users"].insert_one({"_id": "u1", "name": "Author"})
+            await db["blogPost"].insert_many([post("p1", "u1"), post("p2", "u1")])
+            count = await count_posts(RacingDb(db, "u1"), "u1")
+            return count, await db["users"].find_one({"_id": "u1"})
+
+    count, user = asyncio.run(run())
+    assert count == user["post_count"] == 3
+
+
+def test_backfill_survives_a_create_whose_inc_lands_late(api):
+    async def run():
+        async with api() as (client, db):
+            await db["users"].insert_one({"_id": "u1", "name": "Author"})
+            await db["blogPost"].insert_many([post("p1", "u1"), post("p2", "u1")])
+            count = await count_posts(LateBumpDb(db, "u1"), "u1")
+            return count, await db["users"].find_one({"_id": "u1"})
+
+    count, user = asyncio.run(run())
+    assert count == user["post_count"] == 3
+
+
+def test_counts_follow_writes_after_the_backfill(api):
+    async def run():
+        async with api() as (client, db):
+            await db["users"].insert_many([
+                {"_id": "u1", "name": "Author", "email": "a@example.com"},
+                {"_id": "u2", "name": "Other", "email": "o@example.com"},
+            ])
+            await db["blogPost"].insert_many([post("p1", "u1"), post("p2", "u1")])
+            assert await backfill_post_counts(db) == 2
+            assert await backfill_post_counts(db) == 0
+
+            auth = {"Authorization": f"Bearer {create_access_token({'id': 'u1'})}"}
+            created = await client.post("/blog/", headers=auth, json={"title": "new", "body": "new post"})
+            assert created.status_code == 201
+            assert (await client.delete("/blog/p1", headers=auth)).status_code == 204
+            page = await client.get("/blog/author/u1")
+            other = await client.get("/blog/author/u2")
+            return page.json(), other.json()
+
+    page, other = asyncio.run(run())
+    assert page["post_count"] == 2
+    assert {item["_id"] for item in page["items"]} >= {"p2"}
+    assert other["post_count"] == 0
@@ -0,0 +1,55 @@
+import asyncio
+import time
+
+import pytest
+
+from api.profiling import ProfilingMiddleware, make_token, sign, verify_token
+
+SECRET = "profiling-secret"
+
+
+def test_valid_token():
+    assert verify_token(make_token(60, SECRET), SECRET)
+
+
+def test_expired_or_foreign_token():
+    assert not verify_token(sign(int(time.time()) - 1, SECRET), SECRET)
+    assert not verify_token(make_token(60, "other-secret"), SECRET)
+    assert not verify_token(make_token(60, SECRET), "")
+
+
+@pytest.mark.parametrize("token", [
+    "",
+    "garbage",
+    f"{int(time.time()) + 60}.é",
+    f"{int(time.time()) + 60}." + "é" * 64,
+    "١٢٣٤٥٦٧٨٩٠١.abc",
+    "9" * 5000 + ".abc",
+])
+def test_malformed_token_is_rejected(token):
+    assert verify_token(token, SECRET) is False
+
+
+def test_non_ascii_header_passes_through_unprofiled():
+    calls = []
+
+    async def app(scope, receive, send):
+        calls.append(scope["path"])
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    token = f"{int(time.time()) + 60}.\xe9".encode("latin-1")
+    scope = {"type": "http", "method": "GET", "path": "/blog/", "query_string": b"",
+             "headers": [(b"x-profile", token)]}
+    asyncio.run(ProfilingMiddleware(app, SECRET)(scope, receive, send))
+    assert calls == ["/blog/"]
+    assert sent[0]["status"] == 200
+    assert not any(name == b"server-timing" for name, _ in sent[0]["headers"])
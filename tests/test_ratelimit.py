@@ -0,0 +1,73 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import Depends, FastAPI
+
+from api import ratelimit
+from api.ratelimit import MemoryBuckets, RateLimit, RateLimitHeadersMiddleware, parse_rate
+
+
+@pytest.fixture
+def limited(monkeypatch):
+    monkeypatch.setattr(ratelimit, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(ratelimit, "backend", MemoryBuckets())
+
+    # the /otp shape: two methods on one path with different limits
+    app = FastAPI()
+    app.add_middleware(RateLimitHeadersMiddleware)
+
+    @app.get("/otp", dependencies=[Depends(RateLimit("3/minute"))])
+    def generate():
+        return {}
+
+    @app.post("/otp", dependencies=[Depends(RateLimit("10/minute"))])
+    def verify():
+        return {}
+
+    @app.post("/shared-a", dependencies=[Depends(RateLimit("2/minute", name="shared"))])
+    def shared_a():
+        return {}
+
+    @app.post("/shared-b", dependencies=[Depends(RateLimit("2/minute", name="shared"))])
+    def shared_b():
+        return {}
+
+    return app
+
+
+def statuses(app, requests):
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [(await client.request(method, path)).status_code for method, path in requests]
+
+    return asyncio.run(run())
+
+
+def test_methods_on_one_path_have_their_own_buckets(limited):
+    results = statuses(limited, [("GET", "/otp")] * 4 + [("POST", "/otp")] * 11)
+    assert results[:4] == [200, 200, 200, 429]
+    assert results[4:] == [200] * 10 + [429]
+
+
+def test_named_limit_is_shared_between_routes(limited):
+    results = statuses(limited, [("POST", "/shared-a"), ("POST", "/shared-b"), ("POST", "/shared-a")])
+    assert results == [200, 200, 429]
+
+
+def test_headers_and_retry_after(limited):
+    async def run():
+        transport = httpx.ASGITransport(app=limited)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [await client.get("/otp") for _ in range(4)]
+
+    *allowed, refused = asyncio.run(run())
+    assert [r.headers["ratelimit-remaining"] for r in allowed] == ["2", "1", "0"]
+    assert refused.status_code == 429
+    assert int(refused.headers["retry-after"]) == 20
+
+
+@pytest.mark.parametrize("rate,expected", [("3/minute", (3, 0.05)), ("10/seconds", (10, 10.0))])
+def test_parse_rate(rate, expected):
+    assert parse_rate(rate) == expected
@@ -0,0 +1,43 @@
+import asyncio
+import base64
+import json
+
+import pytest
+
+
+def raw_cursor(*parts) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(parts)).encode()).decode().rstrip("=")
+
+
+def post(id: str, body: str) -> dict:
+    return {"_id": id, "title": "t", "body": body, "excerpt": body, "word_count": 1,
+            "author_id": "u", "author_name": "A", "created_at": "2024-01-01T00:00:00+00:00"}
+
+
+def search(api, params_list):
+    async def run():
+        async with api() as (client, db):
+            from api.search import search_backend
+            await db["blogPost"].insert_many([post(f"p{n}", "lorem ipsum") for n in range(3)])
+            await search_backend.rebuild(db)
+            return [await client.get("/blog/search", params=params) for params in params_list]
+
+    return asyncio.run(run())
+
+
+def test_pages_through_results(api):
+    first, = search(api, [{"q": "lorem", "limit": 2}])
+    assert first.status_code == 200
+    body = first.json()
+    assert len(body["items"]) == 2 and body["next"]
+
+
+@pytest.mark.parametrize("cursor", [
+    raw_cursor("score", {"$gt": 0}, "x"),
+    raw_cursor("score", "a", "x"),
+    raw_cursor("score", True, "x"),
+    raw_cursor("score", 1.5, 7),
+])
+def test_rejects_cursors_without_a_numeric_score(api, cursor):
+    response, = search(api, [{"q": "lorem", "cursor": cursor}])
+    assert response.status_code == 400